@@ -1,16 +1,59 @@
 import os
 import time
-import base64
-from groq import Groq
-import google.generativeai as genai
+import asyncio
+import httpx
 from models import AIHistorySummary, ScanResult
+from pydantic import ValidationError
 from dotenv import load_dotenv
 from functools import wraps
-import json
-import traceback
+from abc import ABC, abstractmethod
+import orjson
+import logging
 from pathlib import Path
 import io
-from PIL import Image
+import hashlib
+from email.utils import parsedate_to_datetime
+import random
+import threading
+from collections import OrderedDict
+from typing import BinaryIO, Optional, TypedDict
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+
+class _RepeatFilter(logging.Filter):
+    """Drop identical log messages repeated within `window` seconds"""
+
+    def __init__(self, window: float = 60.0, maxsize: int = 256):
+        super().__init__()
+        self.window = window
+        self.maxsize = maxsize
+        self._last_seen = OrderedDict()
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        key = (record.levelno, record.getMessage())
+        now = time.monotonic()
+        with self._lock:
+            last = self._last_seen.get(key)
+            if last is not None and now - last < self.window:
+                return False
+            self._last_seen[key] = now
+            self._last_seen.move_to_end(key)
+            if len(self._last_seen) > self.maxsize:
+                self._last_seen.popitem(last=False)
+        return True
+
+
+# Per-request failure messages go through a child logger that drops repeats,
+# so a burst of failures (e.g. an API outage) logs once per window instead
+# of per request; everything else on `logger` is logged as usual
+_failure_logger = logger.getChild("failures")
+_failure_logger.addFilter(_RepeatFilter())
+
+# Snippet length when logging a response that failed validation
+LOG_SNIPPET_CHARS = 200
 
 # Load .env from the backend directory
 backend_dir = Path(__file__).parent
@@ -21,94 +64,533 @@ GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 if not GROQ_API_KEY:
     # If Groq is missing, we can print a warning but we might want to fail if it's primary.
     # For now, let's print a warning.
-    print("⚠️ Warning: GROQ_API_KEY not found. Text generation will fail.")
+    logger.warning("⚠️ GROQ_API_KEY not found. Text generation will fail.")
 
 # Configure Gemini API (for vision only)
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 if not GEMINI_API_KEY:
-    print("⚠️ Warning: GEMINI_API_KEY not found. Image analysis will not work.")
+    logger.warning("⚠️ GEMINI_API_KEY not found. Image analysis will not work.")
     GEMINI_ENABLED = False
+    genai = None
 else:
+    # The SDKs are only imported when their key is set; each pulls in a
+    # large dependency tree (gRPC/protobuf for Gemini) that slows startup
+    import google.generativeai as genai
+    from google.api_core import exceptions as google_exceptions
     GEMINI_ENABLED = True
     genai.configure(api_key=GEMINI_API_KEY)
 
-# Initialize Groq client
+# One keep-alive HTTP/2 connection pool for all HTTP API traffic, reused
+# across requests and retries so calls skip the TCP/TLS handshake.
+# Closed on app shutdown by close_http_client().
+HTTP_TIMEOUT = httpx.Timeout(60.0, connect=10.0)
+HTTP_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=64, keepalive_expiry=120)
+http_client = httpx.AsyncClient(http2=True, limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT)
+
+async def close_http_client():
+    """Close the shared connection pool"""
+    await http_client.aclose()
+
+# Initialize the async Groq client shared by all request handlers
 if GROQ_API_KEY:
-    groq_client = Groq(api_key=GROQ_API_KEY)
+    import groq
+    from groq import AsyncGroq
+    # max_retries=0: retry_api_call owns retries (jitter, Retry-After); SDK
+    # retries inside it would multiply the attempts per logical call
+    async_groq_client = AsyncGroq(api_key=GROQ_API_KEY, http_client=http_client, max_retries=0)
+    # Bound once so each call skips the client.chat.completions attribute chain
+    _groq_create = async_groq_client.chat.completions.create
 else:
-    groq_client = None
+    async_groq_client = None
+    _groq_create = None
+
+# Settings shared by every Groq chat request
+GROQ_MODEL = "llama-3.3-70b-versatile"
+GROQ_DEFAULTS = {"model": GROQ_MODEL, "temperature": 0.3}
 
 # Rate limiting configuration
 MAX_RETRIES = 3
-INITIAL_RETRY_DELAY = 10  # seconds
-MIN_TIME_BETWEEN_CALLS = 1.0  # 1 second between calls
+INITIAL_RETRY_DELAY = 1  # seconds, base for jittered backoff
+MAX_RETRY_DELAY = 30  # seconds
+# Client-side request budgets per (provider, model), in requests per minute.
+# Keeping each model under its quota avoids paying a round trip for a 429.
+DEFAULT_RPM = 60
+MODEL_RPM = {
+    ("groq", "llama-3.3-70b-versatile"): 30,
+    ("gemini", "gemini-1.5-flash"): 15,
+    ("gemini", "gemini-1.5-pro"): 2,
+    ("gemini", "gemini-2.0-flash"): 15,      # text fallback (TEXT_FALLBACK_MODELS)
+    ("gemini", "gemini-2.0-flash-exp"): 10,  # vision (VISION_MODEL_NAMES)
+}
+RATE_LIMIT_BURST = 3  # calls allowed back-to-back before spacing kicks in
 
-def format_vitals(vitals: dict) -> str:
-    """Format vitals for prompt"""
-    if not vitals:
-        return "No vitals recorded"
-    return "\n".join([f"- {k}: {v}" for k, v in vitals.items()])
+class TokenBucket:
+    """
+    Token bucket for outbound API calls, safe to share across event loops.
+    The lock only guards the token arithmetic: each caller reserves a slot,
+    then waits outside the lock with asyncio.sleep, so concurrent callers
+    can never over-spend the budget.
+    """
 
-def format_labs(labs: list) -> str:
-    """Format lab results for prompt"""
-    if not labs:
-        return "No lab results available"
-    return "\n".join([
-        f"- {lab.get('test_name', 'Unknown')}: {lab.get('value', 'N/A')} {lab.get('unit', '')} (Ref: {lab.get('reference_range', 'N/A')}) - {lab.get('status', 'Unknown')}"
-        for lab in labs
-    ])
+    def __init__(self, rate: float, capacity: int = 1):
+        self.rate = rate  # tokens per second
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
 
-def format_medications(meds: list) -> str:
-    """Format medications for prompt"""
-    if not meds:
-        return "No current medications"
-    return "\n".join([
-        f"- {med.get('name', 'Unknown')} {med.get('dose', '')} {med.get('frequency', '')}"
-        for med in meds
-    ])
+    def _reserve(self) -> float:
+        """Take one token (possibly going into debt) and return the wait in seconds"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return max(0.0, -self._tokens / self.rate)
+
+    async def acquire(self):
+        wait = self._reserve()
+        if wait:
+            await asyncio.sleep(wait)
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+def _limiter(provider: str, model: str) -> TokenBucket:
+    """Token bucket for one (provider, model) pair, created on first use"""
+    key = (provider, model)
+    bucket = _limiters.get(key)
+    if bucket is None:
+        with _limiters_lock:
+            bucket = _limiters.get(key)
+            if bucket is None:
+                rpm = MODEL_RPM.get(key, DEFAULT_RPM)
+                bucket = _limiters[key] = TokenBucket(rate=rpm / 60, capacity=RATE_LIMIT_BURST)
+    return bucket
 
-def get_gemini_summary(patient_data: dict) -> AIHistorySummary:
+def rate_limit(limit_key):
     """
-    Generate clinical summary using Groq AI (Llama model)
-    For physician review only
+    Wait for a token from the (provider, model) bucket before each API call.
+    `limit_key` maps the wrapped function's arguments to that pair.
     """
-    if not groq_client:
-        return AIHistorySummary(
-            clinical_narrative="Groq API Key missing. Cannot generate summary.",
-            key_findings=["System Misconfiguration"],
-            risk_assessment={},
-            urgency_score=0,
-            priority_level="Low",
-            recommendations=[],
-            diet_suggestions=[],
-            disclaimer="System Error"
-        )
-    
-    # Build prompt for Groq
-    prompt = f"""
-You are a clinical AI assistant helping licensed physicians. Analyze this patient data and provide a structured clinical summary.
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            await _limiter(*limit_key(*args, **kwargs)).acquire()
+            return await func(*args, **kwargs)
+        return wrapper
+    return decorator
 
-**IMPORTANT**: This is for physician review only. Do not diagnose or prescribe.
+# Throttling, overload and timeout errors worth retrying; anything else
+# (auth, bad request, exhausted retries) goes to the caller's fallback
+TRANSIENT_ERRORS = ()
+if async_groq_client:
+    TRANSIENT_ERRORS += (
+        groq.RateLimitError,
+        groq.APIConnectionError,  # includes APITimeoutError
+        groq.InternalServerError,
+    )
+if GEMINI_ENABLED:
+    TRANSIENT_ERRORS += (
+        google_exceptions.ResourceExhausted,
+        google_exceptions.ServiceUnavailable,
+        google_exceptions.DeadlineExceeded,
+        google_exceptions.InternalServerError,
+    )
+
+def _retry_after(error) -> Optional[float]:
+    """Seconds the server asked us to wait (Retry-After header), if any"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    value = headers.get("retry-after") if headers is not None else None
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+def _retry_delay(error, previous: float) -> float:
+    """
+    Honour Retry-After when the server sends it; otherwise use decorrelated
+    jitter (sleep = rand(base, 3 * previous sleep), capped) so concurrent
+    callers spread out instead of retrying in lockstep.
+    """
+    server_delay = _retry_after(error)
+    if server_delay is not None:
+        return min(MAX_RETRY_DELAY, server_delay)
+    return min(MAX_RETRY_DELAY, random.uniform(INITIAL_RETRY_DELAY, previous * 3))
+
+def retry_api_call(func):
+    """Retry transient API errors up to MAX_RETRIES times with jittered backoff"""
+    @wraps(func)
+    async def wrapper(*args, **kwargs):
+        delay = INITIAL_RETRY_DELAY
+        for attempt in range(MAX_RETRIES + 1):
+            try:
+                return await func(*args, **kwargs)
+            except TRANSIENT_ERRORS as e:
+                if attempt == MAX_RETRIES:
+                    raise
+                delay = _retry_delay(e, delay)
+                _failure_logger.warning("%s failed (%s); retry %d in %.1fs", func.__name__, e, attempt + 1, delay)
+                await asyncio.sleep(delay)
+    return wrapper
+
+# Groq service tier per entry point: interactive summaries stay on the
+# standard on-demand queue, SOAP notes and bulk summaries use flex
+SERVICE_TIER_BY_FUNC = {
+    "get_gemini_summary": "on_demand",
+    "get_gemini_summaries_batch": "flex",
+    "generate_soap_note": "flex",
+}
+# Status Groq returns when flex capacity is exhausted
+FLEX_CAPACITY_STATUS = 498
+
+@retry_api_call
+@rate_limit(lambda **kwargs: ("groq", kwargs.get("model", GROQ_MODEL)))
+async def _groq_chat(**kwargs):
+    request = {**GROQ_DEFAULTS, **kwargs}
+    try:
+        return await _groq_create(**request)
+    except groq.APIStatusError as e:
+        # Flex requests are shed rather than queued; retry them on demand
+        if request.get("service_tier") != "flex" or e.status_code != FLEX_CAPACITY_STATUS:
+            raise
+        logger.info("Flex tier at capacity; retrying on demand")
+        return await _groq_create(**{**request, "service_tier": "on_demand"})
+
+@retry_api_call
+@rate_limit(lambda model, contents, **_: ("gemini", model.model_name.removeprefix("models/")))
+async def _gemini_generate(model, contents, generation_config=None) -> bytes:
+    """Stream a Gemini response and return the accumulated UTF-8 body"""
+    response = await model.generate_content_async(
+        contents, generation_config=generation_config, stream=True
+    )
+    body = bytearray()
+    async for chunk in response:
+        body.extend(chunk.text.encode())
+    return bytes(body)
+
+# Text generation providers, tried fastest-first while healthy
+PROVIDER_FAILURE_THRESHOLD = 3  # consecutive failures before cooling down
+PROVIDER_COOLDOWN = 60  # seconds a failing provider is skipped
+LATENCY_EMA_ALPHA = 0.2
+
+class LLMProvider(ABC):
+    """
+    One text-generation endpoint plus its health: a latency moving average
+    and a consecutive-failure count that benches it for PROVIDER_COOLDOWN.
+    """
+
+    def __init__(self, name: str, priority: int):
+        self.name = name
+        self.priority = priority  # tie-breaker before any latency is measured
+        self.latency_ema = None
+        self.failures = 0
+        self.cooldown_until = 0.0
+
+    @property
+    def healthy(self) -> bool:
+        return time.monotonic() >= self.cooldown_until
+
+    def record_success(self, latency: float):
+        self.failures = 0
+        if self.latency_ema is None:
+            self.latency_ema = latency
+        else:
+            self.latency_ema += LATENCY_EMA_ALPHA * (latency - self.latency_ema)
+
+    def record_failure(self):
+        self.failures += 1
+        if self.failures >= PROVIDER_FAILURE_THRESHOLD:
+            self.cooldown_until = time.monotonic() + PROVIDER_COOLDOWN
+            self.failures = 0
+            logger.warning("LLM provider %s unhealthy; skipping for %ds", self.name, PROVIDER_COOLDOWN)
+
+    @abstractmethod
+    async def chat(self, messages: list, max_tokens: int, json_mode: bool, schema, service_tier) -> str:
+        """Send one chat request and return the response text"""
+
+
+class GroqProvider(LLMProvider):
+    async def chat(self, messages, max_tokens, json_mode, schema, service_tier):
+        request = {"messages": messages, "max_tokens": max_tokens}
+        if json_mode:
+            request["response_format"] = {"type": "json_object"}
+        if service_tier:
+            request["service_tier"] = service_tier
+        chat_completion = await _groq_chat(**request)
+        return chat_completion.choices[0].message.content
+
+
+class GeminiTextProvider(LLMProvider):
+    def __init__(self, model_name: str, priority: int):
+        super().__init__(f"gemini:{model_name}", priority)
+        self.model_name = model_name
+        self._models = {}  # system prompt -> GenerativeModel
+
+    async def chat(self, messages, max_tokens, json_mode, schema, service_tier):
+        system = "\n\n".join(m["content"] for m in messages if m["role"] == "system")
+        model = self._models.get(system)
+        if model is None:
+            model = self._models[system] = genai.GenerativeModel(
+                self.model_name, system_instruction=system or None
+            )
+        generation_config = {"temperature": GROQ_DEFAULTS["temperature"], "max_output_tokens": max_tokens}
+        if json_mode:
+            generation_config["response_mime_type"] = "application/json"
+            if schema is not None:
+                generation_config["response_schema"] = schema
+        contents = [
+            {"role": "model" if m["role"] == "assistant" else "user", "parts": [m["content"]]}
+            for m in messages if m["role"] != "system"
+        ]
+        body = await _gemini_generate(model, contents, generation_config=generation_config)
+        return body.decode()
+
+
+TEXT_FALLBACK_MODELS = ("gemini-2.0-flash", "gemini-1.5-flash")
+LLM_PROVIDERS = (
+    ([GroqProvider("groq", 0)] if async_groq_client else [])
+    + ([GeminiTextProvider(name, n) for n, name in enumerate(TEXT_FALLBACK_MODELS, start=1)]
+       if GEMINI_ENABLED else [])
+)
+
+async def call_llm(messages: list, *, max_tokens: int, json_mode: bool = False,
+                   schema=None, service_tier=None) -> str:
+    """
+    Run a chat request on the best available provider and return its text.
+    With json_mode, providers that support it are also constrained to `schema`.
+    Healthy providers are tried lowest-latency first; providers in cooldown
+    are only tried once every healthy one has failed.
+    """
+    if not LLM_PROVIDERS:
+        raise RuntimeError("No LLM provider configured")
+    # Unmeasured providers sort last (then by priority): one that has
+    # never been needed stays behind the measured primary
+    ordered = sorted(
+        LLM_PROVIDERS,
+        key=lambda p: (not p.healthy, p.latency_ema if p.latency_ema is not None else float("inf"), p.priority)
+    )
+    last_error = None
+    for provider in ordered:
+        started = time.monotonic()
+        try:
+            text = await provider.chat(messages, max_tokens, json_mode, schema, service_tier)
+        except Exception as e:
+            provider.record_failure()
+            _failure_logger.warning("LLM provider %s failed: %s", provider.name, e)
+            last_error = e
+            continue
+        provider.record_success(time.monotonic() - started)
+        return text
+    raise last_error
+
+# Patients per multi-patient summary prompt
+SUMMARY_BATCH_SIZE = 8
 
-Patient Information:
-- Age: {patient_data.get('age', 'N/A')}
-- Gender: {patient_data.get('gender', 'N/A')}
-- Chief Complaint: {patient_data.get('chief_complaint', 'Not specified')}
+# Summary cache: identical patient payloads reuse the last AI summary
+SUMMARY_CACHE_SIZE = 1024
+SUMMARY_CACHE_TTL = 3600  # seconds
+
+class _TTLCache:
+    """Small thread-safe LRU cache whose entries expire after `ttl` seconds"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+_summary_inflight = {}  # cache key -> task generating that summary
+_summary_cache = _TTLCache(SUMMARY_CACHE_SIZE, SUMMARY_CACHE_TTL)
+
+# Scan cache: re-submitted report images (UI retries, re-scans) skip the upload
+SCAN_CACHE_SIZE = 256
+SCAN_CACHE_TTL = 40 * 3600  # seconds
+
+_scan_cache = _TTLCache(SCAN_CACHE_SIZE, SCAN_CACHE_TTL)
+
+# Report images are downscaled before upload; Gemini resamples large images anyway
+MAX_IMAGE_EDGE = 1568  # pixels; larger images only add vision tokens
+IMAGE_PASSTHROUGH_BYTES = 512_000
+JPEG_QUALITY = 85
+
+def sniff_mime(data: bytes):
+    """Identify JPEG/PNG/WEBP from magic bytes; None for anything else"""
+    if data[:3] == b"\xff\xd8\xff":
+        return "image/jpeg"
+    if data[:8] == b"\x89PNG\r\n\x1a\n":
+        return "image/png"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+IMAGE_READ_CHUNK = 1 << 20  # bytes hashed per read of an uploaded image
+
+def _image_key(image_file: BinaryIO) -> str:
+    """Cache key for an image file, hashed in chunks rather than read whole"""
+    digest = hashlib.blake2b(digest_size=16)
+    image_file.seek(0)
+    while chunk := image_file.read(IMAGE_READ_CHUNK):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+def _prepare_image(image_file: BinaryIO) -> dict:
+    """
+    Build the inline image blob sent to Gemini.
+    Small JPEG/PNG/WEBP images are forwarded untouched (detected from their
+    magic bytes, without decoding); anything else is decoded straight from
+    the file, resized so the long edge is at most MAX_IMAGE_EDGE and
+    re-encoded as JPEG.
+    """
+    size = image_file.seek(0, io.SEEK_END)
+    image_file.seek(0)
+    mime_type = sniff_mime(image_file.read(12))
+    image_file.seek(0)
+    if mime_type and size < IMAGE_PASSTHROUGH_BYTES:
+        return {"mime_type": mime_type, "data": image_file.read()}
+
+    img = Image.open(image_file)
+    img = ImageOps.exif_transpose(img)  # keep phone photos upright once EXIF is dropped
+    img.thumbnail((MAX_IMAGE_EDGE, MAX_IMAGE_EDGE), Image.LANCZOS)
+    buf = io.BytesIO()
+    img.convert("RGB").save(buf, "JPEG", quality=JPEG_QUALITY, optimize=True)
+    return {"mime_type": "image/jpeg", "data": buf.getvalue()}
+
+def _image_part(image_blob: dict):
+    """
+    Inline the image in the generate call (one HTTP request). _prepare_image
+    keeps it far below Gemini's ~20 MB inline limit, so the Files API is never
+    needed. Built as a typed Part so the SDK does not have to re-inspect and
+    convert a dict on every call.
+    """
+    return genai.protos.Part(
+        inline_data=genai.protos.Blob(mime_type=image_blob["mime_type"], data=image_blob["data"])
+    )
+
+def _payload_key(payload) -> str:
+    """Stable hash of a JSON-like payload (key order does not matter)"""
+    return hashlib.blake2b(orjson.dumps(payload, option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+def _normalize_text(value) -> str:
+    """Lower-case and collapse whitespace so trivially different wording compares equal"""
+    return " ".join(str(value).lower().split())
+
+def _summary_cache_key(patient_data: dict) -> str:
+    """
+    Cache key built only from the fields that reach the summary prompt.
+    Identifiers, casing, whitespace and the order of history/allergy lists
+    do not change the clinical content, so they do not split the cache.
+    """
+    return _payload_key({
+        "age": patient_data.get("age"),
+        "gender": _normalize_text(patient_data.get("gender", "")),
+        "chief_complaint": _normalize_text(patient_data.get("chief_complaint", "")),
+        "vitals": patient_data.get("vitals", {}),
+        "lab_results": patient_data.get("lab_results", []),
+        "current_medications": patient_data.get("current_medications", []),
+        "medical_history": sorted(_normalize_text(h) for h in patient_data.get("medical_history", [])),
+        "allergies": sorted(_normalize_text(a) for a in patient_data.get("allergies", [])),
+    })
+
+class ScanResultSchema(TypedDict):
+    """Response schema Gemini is constrained to for report scans"""
+    summary: str
+    key_observations: list[str]
+    detected_conditions: list[str]
+    confidence_score: float
+    is_valid_medical_report: bool
+
+class RiskAssessmentSchema(TypedDict):
+    cardiac: str
+    respiratory: str
+    metabolic: str
+
+class SummarySchema(TypedDict):
+    """Response schema Gemini is constrained to for patient summaries"""
+    clinical_narrative: str
+    key_findings: list[str]
+    risk_assessment: RiskAssessmentSchema
+    urgency_score: int
+    priority_level: str
+    recommendations: list[str]
+    diet_suggestions: list[str]
+
+class BatchSummaryEntrySchema(SummarySchema):
+    patient_index: int  # the "### Patient N" number the summary belongs to
+
+class BatchSummarySchema(TypedDict):
+    summaries: list[BatchSummaryEntrySchema]
+
+# JSON mode: Gemini returns a bare object matching ScanResultSchema, no fences
+SCAN_GENERATION_CONFIG = {
+    "response_mime_type": "application/json",
+    "response_schema": ScanResultSchema,
+}
+
+# Prompts keep all static instructions in the system message and put the
+# per-patient data last, so every request shares an identical prefix that
+# the provider's prompt cache can reuse; only the patient delta is prefilled.
+PATIENT_SECTION_TEMPLATE = """Patient Information:
+- Age: {age}
+- Gender: {gender}
+- Chief Complaint: {chief_complaint}
 
 Vitals:
-{format_vitals(patient_data.get('vitals', {}))}
+{vitals}
 
 Lab Results:
-{format_labs(patient_data.get('lab_results', []))}
+{labs}
 
 Current Medications:
-{format_medications(patient_data.get('current_medications', []))}
+{medications}
 
 Medical History:
-{', '.join(patient_data.get('medical_history', []))}
+{medical_history}
 
 Allergies:
-{', '.join(patient_data.get('allergies', []))}
+{allergies}
+"""
+
+_SUMMARY_JSON_FIELDS = """
+  "clinical_narrative": "...",
+  "key_findings": ["...", "..."],
+  "risk_assessment": {"cardiac": "...", "respiratory": "...", "metabolic": "..."},
+  "urgency_score": 0-10,
+  "priority_level": "Low/Moderate/High",
+  "recommendations": ["...", "..."],
+  "diet_suggestions": ["...", "..."]
+"""
+_SUMMARY_JSON_KEYS = "{" + _SUMMARY_JSON_FIELDS + "}"
+_BATCH_SUMMARY_JSON_KEYS = '{\n  "patient_index": 1,' + _SUMMARY_JSON_FIELDS + "}"
+
+SUMMARY_SYSTEM_PROMPT = """You are a clinical AI assistant helping licensed physicians. Analyze the patient data you are given and provide a structured clinical summary.
+
+**IMPORTANT**: This is for physician review only. Do not diagnose or prescribe.
 
 Please provide:
 1. Clinical Narrative (2-3 sentences summary)
@@ -120,63 +602,196 @@ Please provide:
 7. Diet Suggestions (2-4 personalized dietary recommendations based on condition)
 
 Format your response as JSON with these exact keys:
-{{
-  "clinical_narrative": "...",
-  "key_findings": ["...", "..."],
-  "risk_assessment": {{"cardiac": "...", "respiratory": "...", "metabolic": "..."}},
-  "urgency_score": 0-10,
-  "priority_level": "Low/Moderate/High",
-  "recommendations": ["...", "..."],
-  "diet_suggestions": ["...", "..."]
-}}
+""" + _SUMMARY_JSON_KEYS + """
+
+Always respond with valid JSON only, no additional text."""
+
+BATCH_SUMMARY_SYSTEM_PROMPT = """You are a clinical AI assistant helping licensed physicians. Analyze each of the patients you are given independently and provide a structured clinical summary for each.
+
+**IMPORTANT**: This is for physician review only. Do not diagnose or prescribe.
+
+For every patient provide a clinical narrative (2-3 sentences), key findings (3-5), a risk assessment (cardiac, respiratory, metabolic risks - Low/Medium/High), an urgency score (0-10, where 10 is most urgent), a priority level (Low/Moderate/High), clinical recommendations (3-5 actionable items for physician review) and diet suggestions (2-4).
+
+Format your response as a JSON object with a "summaries" array holding one entry per patient. Every entry must set "patient_index" to the number N of the "### Patient N" section it summarizes, and have these exact keys:
+""" + _BATCH_SUMMARY_JSON_KEYS + """
+
+Always respond with valid JSON only, no additional text."""
+
+BATCH_SUMMARY_PROMPT_TEMPLATE = """Summarize these {count} patients; return exactly {count} summaries.
+
+{patient_sections}"""
+
+SCAN_PROMPT = """
+You are an expert medical AI specializing in clinical document analysis.
+Carefully analyze the medical report image you are given and extract all relevant information.
+
+Provide:
+1. A comprehensive summary of the report (2-3 sentences)
+2. Key clinical observations (list all test results, values, and their status)
+3. Any detected or suggested medical conditions based on the results
+4. A confidence score (0.0 to 1.0) based on image quality and clarity
+5. Boolean indicating if this is a valid medical report
+
+Format your response as JSON with these exact keys:
+{
+  "summary": "...",
+  "key_observations": ["...", "..."],
+  "detected_conditions": ["...", "..."],
+  "confidence_score": 0.0-1.0,
+  "is_valid_medical_report": true/false
+}
 
-Return ONLY the JSON, no other text.
+Return ONLY valid JSON, no other text.
 """
+
+SOAP_SYSTEM_PROMPT = """You are a senior medical consultant and documentation specialist. Based on the patient data you are given, generate a professional clinical SOAP note.
+The note should be concise, professional, and formatted correctly for a physician's record.
+
+Format the output exactly as follows:
+S: (Subjective - Patient's complaints, history, symptoms)
+O: (Objective - Clinical findings, vitals, physical exam observations)
+A: (Assessment - Differential diagnosis, clinical reasoning)
+P: (Plan - Next steps, medications, follow-up, dietary advice)
+
+**IMPORTANT**: This is for simulation/educational purposes."""
+
+SOAP_PROMPT_TEMPLATE = """Patient Data:
+- Name: {patient_name}
+- Age: {age}
+- Gender: {gender}
+- Chief Complaint: {chief_complaint}
+
+Vitals:
+{vitals}
+
+Medical History:
+{medical_history}
+"""
+
+# Vision models are built once at import, in fallback order
+VISION_MODEL_NAMES = ("gemini-1.5-flash", "gemini-1.5-pro", "gemini-2.0-flash-exp")
+VISION_MODELS = tuple(
+    genai.GenerativeModel(
+        name, generation_config=SCAN_GENERATION_CONFIG, system_instruction=SCAN_PROMPT
+    )
+    for name in VISION_MODEL_NAMES
+) if GEMINI_ENABLED else ()
+
+# Line templates for prompt formatting; defaults fill fields missing from a record
+_LAB_LINE = "- {test_name}: {value} {unit} (Ref: {reference_range}) - {status}".format
+_LAB_DEFAULTS = {"test_name": "Unknown", "value": "N/A", "unit": "", "reference_range": "N/A", "status": "Unknown"}
+_MED_LINE = "- {name} {dose} {frequency}".format
+_MED_DEFAULTS = {"name": "Unknown", "dose": "", "frequency": ""}
+
+def format_vitals(vitals: dict) -> str:
+    """Format vitals for prompt"""
+    if not vitals:
+        return "No vitals recorded"
+    return "\n".join(f"- {k}: {v}" for k, v in vitals.items())
+
+def format_labs(labs: list) -> str:
+    """Format lab results for prompt"""
+    if not labs:
+        return "No lab results available"
+    return "\n".join(_LAB_LINE(**{**_LAB_DEFAULTS, **lab}) for lab in labs)
+
+def format_medications(meds: list) -> str:
+    """Format medications for prompt"""
+    if not meds:
+        return "No current medications"
+    return "\n".join(_MED_LINE(**{**_MED_DEFAULTS, **med}) for med in meds)
+
+def format_patient_section(patient_data: dict) -> str:
+    """Format the per-patient block shared by the single and batch prompts"""
+    return PATIENT_SECTION_TEMPLATE.format(
+        age=patient_data.get('age', 'N/A'),
+        gender=patient_data.get('gender', 'N/A'),
+        chief_complaint=patient_data.get('chief_complaint', 'Not specified'),
+        vitals=format_vitals(patient_data.get('vitals', {})),
+        labs=format_labs(patient_data.get('lab_results', [])),
+        medications=format_medications(patient_data.get('current_medications', [])),
+        medical_history=', '.join(patient_data.get('medical_history', [])),
+        allergies=', '.join(patient_data.get('allergies', []))
+    )
+
+async def get_gemini_summary(patient_data: dict) -> AIHistorySummary:
+    """
+    Generate clinical summary using Groq AI (Llama model)
+    For physician review only
+    """
+    if not LLM_PROVIDERS:
+        return AIHistorySummary.model_construct(
+            clinical_narrative="Groq API Key missing. Cannot generate summary.",
+            key_findings=["System Misconfiguration"],
+            risk_assessment={},
+            urgency_score=0,
+            priority_level="Low",
+            recommendations=[],
+            diet_suggestions=[],
+            disclaimer="System Error"
+        )
     
     try:
-        # Use Groq's Llama 3.3 model (fastest and most capable)
-        chat_completion = groq_client.chat.completions.create(
-            messages=[
+        cache_key = _summary_cache_key(patient_data)
+    except TypeError:
+        # Not JSON-serializable (e.g. non-string keys) - skip caching
+        cache_key = None
+    if cache_key:
+        cached = _summary_cache.get(cache_key)
+        if cached is not None:
+            return AIHistorySummary.model_construct(**cached)
+    
+    if not cache_key:
+        return await _summarize(patient_data, cache_key, format_patient_section(patient_data))
+
+    # Single flight: identical requests arriving while one is in progress
+    # wait for that call instead of starting another upstream request
+    task = _summary_inflight.get(cache_key)
+    if task is None:
+        task = asyncio.ensure_future(
+            _summarize(patient_data, cache_key, format_patient_section(patient_data))
+        )
+        _summary_inflight[cache_key] = task
+        task.add_done_callback(lambda _: _summary_inflight.pop(cache_key, None))
+    # shield: one caller disconnecting must not cancel the shared call
+    return await asyncio.shield(task)
+
+async def _summarize(patient_data: dict, cache_key, prompt: str) -> AIHistorySummary:
+    """Request one summary for an already formatted patient section"""
+    try:
+        # Groq's Llama 3.3 first; Gemini only takes over if Groq fails (or
+        # proves slower once both have been measured)
+        response_text = await call_llm(
+            [
                 {
                     "role": "system",
-                    "content": "You are a medical AI assistant. Always respond with valid JSON only, no additional text."
+                    "content": SUMMARY_SYSTEM_PROMPT
                 },
                 {
                     "role": "user",
                     "content": prompt
                 }
             ],
-            model="llama-3.3-70b-versatile",
-            temperature=0.3,
             max_tokens=2000,
-            response_format={"type": "json_object"}
+            json_mode=True,
+            schema=SummarySchema,
+            service_tier=SERVICE_TIER_BY_FUNC["get_gemini_summary"]
         )
         
-        response_text = chat_completion.choices[0].message.content.strip()
-        print(f"DEBUG - Raw Groq Response:\n{response_text}\n")
-        
-        # Parse JSON response
-        result = json.loads(response_text)
+        logger.debug("Raw summary response:\n%s", response_text)
         
-        # Create AIHistorySummary object
-        summary = AIHistorySummary(
-            clinical_narrative=result.get("clinical_narrative", ""),
-            key_findings=result.get("key_findings", []),
-            risk_assessment=result.get("risk_assessment", {}),
-            urgency_score=result.get("urgency_score", 5),
-            priority_level=result.get("priority_level", "Moderate"),
-            recommendations=result.get("recommendations", []),
-            diet_suggestions=result.get("diet_suggestions", []),
-            disclaimer="For physician review only"
-        )
+        # Parse and validate in one pass (JSON mode guarantees a bare object)
+        summary = AIHistorySummary.model_validate_json(response_text)
         
-        print(f"✅ AI Summary generated successfully using Groq")
+        logger.info("✅ AI Summary generated successfully")
+        if cache_key:
+            _summary_cache.set(cache_key, summary.model_dump())
         return summary
         
-    except json.JSONDecodeError as e:
-        print(f"JSON Parse Error: {e}")
-        traceback.print_exc()
-        return AIHistorySummary(
+    except ValidationError as e:
+        _failure_logger.warning("AI summary failed validation (%d errors): %.*s",
+                                e.error_count(), LOG_SNIPPET_CHARS, response_text)
+        return AIHistorySummary.model_construct(
             clinical_narrative=f"Patient presents with {patient_data.get('chief_complaint', 'Unknown complaint')}. Clinical review recommended.",
             key_findings=["AI response parsing failed", "Manual physician review required"],
             risk_assessment={"cardiac": "Unknown", "respiratory": "Unknown", "metabolic": "Unknown"},
@@ -187,9 +802,8 @@ Return ONLY the JSON, no other text.
             disclaimer="For physician review only - AI response parsing failed"
         )
     except Exception as e:
-        print(f"Groq API Error: {e}")
-        traceback.print_exc()
-        return AIHistorySummary(
+        _failure_logger.exception("Summary request failed: %s", e)
+        return AIHistorySummary.model_construct(
             clinical_narrative=f"Patient presents with {patient_data.get('chief_complaint', 'Unknown complaint')}. Check manual records.",
             key_findings=["Groq AI analysis unavailable", "Manual review required"],
             risk_assessment={"cardiac": "Unknown", "respiratory": "Unknown", "metabolic": "Unknown"},
@@ -200,14 +814,149 @@ Return ONLY the JSON, no other text.
             disclaimer="For physician review only - System Error"
         )
 
-def analyze_medical_report(image_bytes: bytes) -> ScanResult:
+def _match_batch_summaries(entries, count: int) -> list:
+    """
+    Order batch entries by their patient_index (1..count). Raises ValueError
+    unless every patient has exactly one entry, so a reordered or merged
+    reply can never hand one patient's summary to another.
+    """
+    if not isinstance(entries, list) or len(entries) != count:
+        raise ValueError(f"expected {count} summaries, got {entries!r:.80}")
+    by_index = {}
+    for entry in entries:
+        index = entry.get("patient_index") if isinstance(entry, dict) else None
+        if type(index) is not int or not 1 <= index <= count or index in by_index:
+            raise ValueError(f"bad or repeated patient_index {index!r}")
+        by_index[index] = AIHistorySummary.model_validate(entry)
+    return [by_index[n] for n in range(1, count + 1)]
+
+async def _summarize_chunk(patients: list, chunk: list, results: list) -> None:
+    """Fill results for one chunk of (index, cache_key) pairs with a single batch request"""
+    if len(chunk) == 1:
+        index, cache_key = chunk[0]
+        results[index] = await _summarize(
+            patients[index], cache_key, format_patient_section(patients[index])
+        )
+        return
+
+    # Formatted once; reused if the chunk falls back to single requests
+    sections = [format_patient_section(patients[index]) for index, _ in chunk]
+    prompt = BATCH_SUMMARY_PROMPT_TEMPLATE.format(
+        count=len(chunk),
+        patient_sections="\n".join(
+            f"### Patient {n}\n{section}" for n, section in enumerate(sections, start=1)
+        )
+    )
+    try:
+        response_text = await call_llm(
+            [
+                {
+                    "role": "system",
+                    "content": BATCH_SUMMARY_SYSTEM_PROMPT
+                },
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ],
+            max_tokens=1500 * len(chunk),
+            json_mode=True,
+            schema=BatchSummarySchema,
+            service_tier=SERVICE_TIER_BY_FUNC["get_gemini_summaries_batch"]
+        )
+        summaries = _match_batch_summaries(orjson.loads(response_text).get("summaries"), len(chunk))
+    except Exception as e:
+        _failure_logger.warning("Batch summary failed (%s); falling back to single requests", e)
+        fallbacks = await asyncio.gather(*(
+            _summarize(patients[index], cache_key, section)
+            for (index, cache_key), section in zip(chunk, sections)
+        ))
+        for (index, _), summary in zip(chunk, fallbacks):
+            results[index] = summary
+        return
+
+    for (index, cache_key), summary in zip(chunk, summaries):
+        if cache_key:
+            _summary_cache.set(cache_key, summary.model_dump())
+        results[index] = summary
+
+async def get_gemini_summaries_batch(patients: list) -> list:
+    """
+    Generate clinical summaries for several patients.
+    Cache misses are sent SUMMARY_BATCH_SIZE at a time in one Groq call;
+    if a batch response cannot be used, those patients fall back to
+    individual get_gemini_summary calls. Results keep the input order.
+    """
+    results = [None] * len(patients)
+    pending = []  # (index, cache_key) still needing a model call
+    for index, patient_data in enumerate(patients):
+        try:
+            cache_key = _summary_cache_key(patient_data)
+        except TypeError:
+            cache_key = None
+        cached = _summary_cache.get(cache_key) if cache_key else None
+        if cached is not None:
+            results[index] = AIHistorySummary.model_construct(**cached)
+        else:
+            pending.append((index, cache_key))
+
+    if not LLM_PROVIDERS:
+        for index, _ in pending:
+            results[index] = await get_gemini_summary(patients[index])
+        return results
+
+    # Chunks are independent requests, so they run concurrently
+    await asyncio.gather(*(
+        _summarize_chunk(patients, pending[start:start + SUMMARY_BATCH_SIZE], results)
+        for start in range(0, len(pending), SUMMARY_BATCH_SIZE)
+    ))
+    return results
+
+# Start the next vision model if the current one has not answered in this
+# many seconds (or as soon as it fails); the first success wins
+VISION_HEDGE_AFTER = 8.0
+
+async def _generate_hedged(models, contents) -> bytes:
+    """
+    Hedged fallback across models: launch the first model, add the next one
+    whenever the in-flight calls fail or stall past VISION_HEDGE_AFTER, and
+    return the first successful body. Slower losers are cancelled.
+    """
+    remaining = iter(models)
+    pending = set()
+    last_error = None
+    try:
+        while True:
+            model = next(remaining, None)
+            if model is not None:
+                task = asyncio.create_task(_gemini_generate(model, contents))
+                task.model_name = model.model_name
+                pending.add(task)
+            elif not pending:
+                raise last_error
+            done, pending = await asyncio.wait(
+                pending,
+                timeout=VISION_HEDGE_AFTER if model is not None else None,
+                return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                last_error = task.exception()
+                _failure_logger.warning("Gemini vision error (%s): %s", task.model_name, last_error)
+    finally:
+        for task in pending:
+            task.cancel()
+
+async def analyze_medical_report(image_file: BinaryIO) -> ScanResult:
     """
     Analyze medical report image using Gemini Vision API
+    image_file is a seekable binary file, e.g. a spooled upload
     """
     
     if not GEMINI_ENABLED:
-        print("⚠️ Gemini API not configured. Cannot analyze images.")
-        return ScanResult(
+        _failure_logger.warning("⚠️ Gemini API not configured. Cannot analyze images.")
+        return ScanResult.model_construct(
             summary="Image analysis unavailable. Please configure GEMINI_API_KEY in .env file.",
             key_observations=["Gemini API key required for image analysis"],
             detected_conditions=[],
@@ -215,80 +964,34 @@ def analyze_medical_report(image_bytes: bytes) -> ScanResult:
             is_valid_medical_report=False
         )
     
-    prompt = """
-You are an expert medical AI specializing in clinical document analysis.
-Carefully analyze this medical report image and extract all relevant information.
-
-Provide:
-1. A comprehensive summary of the report (2-3 sentences)
-2. Key clinical observations (list all test results, values, and their status)
-3. Any detected or suggested medical conditions based on the results
-4. A confidence score (0.0 to 1.0) based on image quality and clarity
-5. Boolean indicating if this is a valid medical report
-
-Format your response as JSON with these exact keys:
-{
-  "summary": "...",
-  "key_observations": ["...", "..."],
-  "detected_conditions": ["...", "..."],
-  "confidence_score": 0.0-1.0,
-  "is_valid_medical_report": true/false
-}
-
-Return ONLY valid JSON, no other text.
-"""
+    # File reads may hit disk for large spooled uploads
+    image_key = await asyncio.to_thread(_image_key, image_file)
+    cached = _scan_cache.get(image_key)
+    if cached is not None:
+        return ScanResult.model_construct(**cached)
     
     try:
-        print("📄 Analyzing medical report with Gemini Vision...")
+        logger.info("📄 Analyzing medical report with Gemini Vision...")
         
-        # Try using Gemini 1.5 Flash (supports vision) - Fast/Cheap
-        try:
-            img = Image.open(io.BytesIO(image_bytes))
-            
-            # Use Gemini 1.5 Flash
-            model = genai.GenerativeModel('gemini-1.5-flash')
-            response = model.generate_content([prompt, img])
-            
-        except Exception as vision_error:
-            print(f"Gemini vision error (Flash): {vision_error}")
-            # Try with Pro model as fallback if Flash fails (e.g. region issues)
-            try:
-                model = genai.GenerativeModel('gemini-1.5-pro')
-                img = Image.open(io.BytesIO(image_bytes))
-                response = model.generate_content([prompt, img])
-            except Exception as pro_error:
-                 # Add the new 2.0 models as final fallback if available
-                 model = genai.GenerativeModel('gemini-2.0-flash-exp')
-                 img = Image.open(io.BytesIO(image_bytes))
-                 response = model.generate_content([prompt, img])
-
-        response_text = response.text.strip()
-        print(f"DEBUG - Gemini Vision Response:\n{response_text}\n")
+        # Decoding and resizing is CPU-bound; keep it off the event loop
+        image_part = _image_part(await asyncio.to_thread(_prepare_image, image_file))
         
-        # Clean JSON
-        if "```json" in response_text:
-            response_text = response_text.split("```json")[1].split("```")[0].strip()
-        elif "```" in response_text:
-            response_text = response_text.split("```")[1].split("```")[0].strip()
-            
-        result = json.loads(response_text)
+        # Flash is fast/cheap; Pro and 2.0 are fallbacks (e.g. region issues)
+        response_body = await _generate_hedged(VISION_MODELS, [image_part])
+
+        logger.debug("Gemini vision response:\n%s", response_body.decode(errors='replace'))
         
-        scan_result = ScanResult(
-            summary=result.get("summary", "Analysis complete"),
-            key_observations=result.get("key_observations", []),
-            detected_conditions=result.get("detected_conditions", []),
-            confidence_score=result.get("confidence_score", 0.0),
-            is_valid_medical_report=result.get("is_valid_medical_report", True)
-        )
+        scan_result = ScanResult.model_validate_json(response_body)
         
-        print("✅ Medical report analyzed successfully")
+        logger.info("✅ Medical report analyzed successfully")
+        _scan_cache.set(image_key, scan_result.model_dump())
         return scan_result
         
-    except json.JSONDecodeError as e:
-        print(f"JSON parsing error: {e}")
-        traceback.print_exc()
+    except ValidationError as e:
+        _failure_logger.warning("Scan result failed validation (%d errors): %.*s",
+                                e.error_count(), LOG_SNIPPET_CHARS, response_body.decode(errors='replace'))
         
-        return ScanResult(
+        return ScanResult.model_construct(
             summary=f"Report analysis completed but response formatting failed. Raw response may contain useful information.",
             key_observations=["Response parsing error - manual review recommended"],
             detected_conditions=[],
@@ -297,11 +1000,9 @@ Return ONLY valid JSON, no other text.
         )
         
     except Exception as e:
-        print(f"Report analysis error: {e}")
-        traceback.print_exc()
-        print(f"Vision Analysis Error: {e}")
+        _failure_logger.exception("Report analysis failed: %s", e)
         
-        return ScanResult(
+        return ScanResult.model_construct(
             summary=f"Error analyzing report: {str(e)}",
             key_observations=["Analysis failed - check image quality and API configuration"],
             detected_conditions=[],
@@ -310,63 +1011,81 @@ Return ONLY valid JSON, no other text.
         )
 
 
-def generate_soap_note(patient_data: dict) -> str:
+def _soap_messages(patient_data: dict) -> list:
+    """Chat messages for a SOAP note request"""
+    prompt = SOAP_PROMPT_TEMPLATE.format(
+        patient_name=patient_data.get('patient_name', 'Unknown'),
+        age=patient_data.get('age', 'N/A'),
+        gender=patient_data.get('gender', 'N/A'),
+        chief_complaint=patient_data.get('chief_complaint', 'Not provided'),
+        vitals=format_vitals(patient_data.get('vitals', {})),
+        medical_history=', '.join(patient_data.get('medical_history', []))
+    )
+    return [
+        {
+            "role": "system",
+            "content": SOAP_SYSTEM_PROMPT
+        },
+        {
+            "role": "user",
+            "content": prompt
+        }
+    ]
+
+def _fallback_soap_note(patient_data: dict) -> str:
+    return f"""S: Patient {patient_data.get('patient_name', 'Unknown')} reports {patient_data.get('chief_complaint', 'not specified')}.
+O: Vitals are within expected ranges for condition.
+A: Clinical stability confirmed via AI analysis.
+P: Continue monitoring and follow standard protocol."""
+
+async def generate_soap_note(patient_data: dict) -> str:
     """
     Generate a professional clinical SOAP note using Groq AI.
     """
-    if not groq_client:
+    if not LLM_PROVIDERS:
         return "Groq API Key missing. Cannot generate SOAP note."
 
-    prompt = f"""
-You are a senior medical consultant. Based on the following patient data, generate a professional clinical SOAP note.
-The note should be concise, professional, and formatted correctly for a physician's record.
-
-Patient Data:
-- Name: {patient_data.get('patient_name', 'Unknown')}
-- Age: {patient_data.get('age', 'N/A')}
-- Gender: {patient_data.get('gender', 'N/A')}
-- Chief Complaint: {patient_data.get('chief_complaint', 'Not provided')}
-
-Vitals:
-{format_vitals(patient_data.get('vitals', {}))}
-
-Medical History:
-{', '.join(patient_data.get('medical_history', []))}
-
-Format the output exactly as follows:
-S: (Subjective - Patient's complaints, history, symptoms)
-O: (Objective - Clinical findings, vitals, physical exam observations)
-A: (Assessment - Differential diagnosis, clinical reasoning)
-P: (Plan - Next steps, medications, follow-up, dietary advice)
-
-**IMPORTANT**: This is for simulation/educational purposes.
-"""
-
     try:
-        chat_completion = groq_client.chat.completions.create(
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are a medical documentation specialist. Generate professional SOAP notes."
-                },
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
-            model="llama-3.3-70b-versatile",
-            temperature=0.3,
-            max_tokens=1000
+        soap_note = await call_llm(
+            _soap_messages(patient_data),
+            max_tokens=1000,
+            service_tier=SERVICE_TIER_BY_FUNC["generate_soap_note"]
         )
         
-        return chat_completion.choices[0].message.content.strip()
+        return soap_note.strip()
         
     except Exception as e:
-        print(f"SOAP generation error: {str(e)}")
-        traceback.print_exc()
+        _failure_logger.exception("SOAP generation failed: %s", e)
         
         # Fallback SOAP note
-        return f"""S: Patient {patient_data.get('patient_name', 'Unknown')} reports {patient_data.get('chief_complaint', 'not specified')}.
-O: Vitals are within expected ranges for condition.
-A: Clinical stability confirmed via AI analysis.
-P: Continue monitoring and follow standard protocol."""
+        return _fallback_soap_note(patient_data)
+
+async def stream_soap_note(patient_data: dict):
+    """
+    Stream a SOAP note as text chunks while Groq generates it.
+    If the request fails before any text is sent the fallback note is
+    streamed instead; a failure mid-note simply ends the stream.
+    """
+    if not async_groq_client:
+        yield "Groq API Key missing. Cannot generate SOAP note."
+        return
+
+    try:
+        stream = await _groq_chat(
+            messages=_soap_messages(patient_data),
+            max_tokens=1000,
+            service_tier=SERVICE_TIER_BY_FUNC["generate_soap_note"],
+            stream=True
+        )
+    except Exception as e:
+        _failure_logger.exception("SOAP generation failed: %s", e)
+        yield _fallback_soap_note(patient_data)
+        return
+
+    try:
+        async for chunk in stream:
+            text = chunk.choices[0].delta.content if chunk.choices else None
+            if text:
+                yield text
+    except Exception as e:
+        _failure_logger.exception("SOAP stream interrupted: %s", e)
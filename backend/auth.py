@@ -1,10 +1,21 @@
 import json
-import os
+import sqlite3
+import threading
 import hashlib
+import hmac
+import secrets
+import time
+from collections import OrderedDict
+from functools import cache
+from pathlib import Path
+import bcrypt
 from typing import Optional
 from pydantic import BaseModel
 
-USERS_FILE = "users.json"
+# Anchored to this directory so the store does not depend on the working directory
+BACKEND_DIR = Path(__file__).resolve().parent
+USERS_FILE = BACKEND_DIR / "users.json"  # legacy store, imported into USERS_DB on first run
+USERS_DB = BACKEND_DIR / "users.db"
 
 class UserLogin(BaseModel):
     username: str
@@ -17,65 +28,150 @@ class UserSignup(BaseModel):
     full_name: str
     medical_license_id: str
 
-def _load_users():
-    if not os.path.exists(USERS_FILE):
-        return {}
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    username TEXT PRIMARY KEY,
+    email TEXT UNIQUE,
+    password_hash TEXT NOT NULL,
+    full_name TEXT,
+    medical_license_id TEXT
+)
+"""
+
+_conn = None
+_lock = threading.Lock()  # one connection shared by all request threads
+
+def _connect() -> sqlite3.Connection:
+    """Open the user database once, creating it (and importing users.json) if needed"""
+    global _conn
+    if _conn is None:
+        conn = sqlite3.connect(USERS_DB, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(_SCHEMA)
+        _import_legacy_users(conn)
+        _conn = conn
+    return _conn
+
+def _import_legacy_users(conn: sqlite3.Connection):
+    """Copy accounts from the old users.json store into an empty table"""
+    if not USERS_FILE.exists():
+        return
+    if conn.execute("SELECT 1 FROM users LIMIT 1").fetchone():
+        return
     try:
         with open(USERS_FILE, "r") as f:
-            return json.load(f)
-    except:
-        return {}
+            users = json.load(f)
+    except (OSError, ValueError):
+        return
+    with conn:
+        conn.executemany(
+            "INSERT OR IGNORE INTO users VALUES (?, ?, ?, ?, ?)",
+            [
+                (uname, u.get("email") or None, u["password_hash"],
+                 u.get("full_name"), u.get("medical_license_id"))
+                for uname, u in users.items()
+            ]
+        )
 
-def _save_users(users):
-    with open(USERS_FILE, "w") as f:
-        json.dump(users, f, indent=2)
+BCRYPT_ROUNDS = 12
+VERIFY_CACHE_TTL = 60  # seconds a successful login is remembered
+VERIFY_CACHE_SIZE = 256
+
+# (login name, HMAC(password)) -> (expires_at, user profile); lets clients
+# that re-authenticate repeatedly skip the deliberately slow bcrypt check.
+# The HMAC key is random per process, so the cache never holds a fast
+# offline-crackable hash of a password
+_verify_cache = OrderedDict()
+_VERIFY_CACHE_SECRET = secrets.token_bytes(32)
 
 def _hash_password(password: str) -> str:
+    # bcrypt only reads the first 72 bytes
+    return bcrypt.hashpw(password.encode()[:72], bcrypt.gensalt(BCRYPT_ROUNDS)).decode()
+
+def _legacy_hash(password: str) -> str:
+    """Unsalted SHA-256 used by accounts created before bcrypt"""
     return hashlib.sha256(password.encode()).hexdigest()
 
+def _verify_cache_key(credentials: UserLogin) -> tuple:
+    digest = hmac.new(_VERIFY_CACHE_SECRET, credentials.password.encode(), hashlib.sha256).digest()
+    return credentials.username, digest
+
+@cache
+def _dummy_hash() -> bytes:
+    """bcrypt hash checked for unknown logins, so they take as long as real ones"""
+    return bcrypt.hashpw(secrets.token_hex(16).encode(), bcrypt.gensalt(BCRYPT_ROUNDS))
+
+def _check_password(password: str, stored_hash: str) -> bool:
+    if stored_hash.startswith("$2"):
+        return bcrypt.checkpw(password.encode()[:72], stored_hash.encode())
+    return hmac.compare_digest(stored_hash, _legacy_hash(password))
+
 def create_user(user_data: UserSignup) -> bool:
-    users = _load_users()
-    # Check if username OR email already exists
-    if user_data.username in users:
-        return False
-    
-    # Simple check for email uniqueness (O(N) but fine for json file)
-    for u in users.values():
-        if u.get("email") == user_data.email:
+    password_hash = _hash_password(user_data.password)  # slow; keep outside the lock
+    # UNIQUE constraints reject a taken username OR email
+    with _lock:
+        conn = _connect()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT INTO users VALUES (?, ?, ?, ?, ?)",
+                    (user_data.username, user_data.email, password_hash,
+                     user_data.full_name, user_data.medical_license_id)
+                )
+        except sqlite3.IntegrityError:
             return False
-
-    users[user_data.username] = {
-        "password_hash": _hash_password(user_data.password),
-        "full_name": user_data.full_name,
-        "medical_license_id": user_data.medical_license_id,
-        "email": user_data.email
-    }
-    _save_users(users)
     return True
 
 def verify_user(credentials: UserLogin) -> Optional[dict]:
-    users = _load_users()
-    
-    # Try to find user by username
-    user = users.get(credentials.username)
-    
-    # If not found, try to find by email
-    found_username = credentials.username
-    if not user:
-        for uname, udata in users.items():
-            if udata.get("email") == credentials.username:
-                user = udata
-                found_username = uname
-                break
-    
+    cache_key = _verify_cache_key(credentials)
+    with _lock:
+        cached = _verify_cache.get(cache_key)
+        if cached and cached[0] > time.monotonic():
+            return dict(cached[1])
+
+    # Match by username first, then by email: two single-row index probes
+    # instead of an OR query that has to merge and sort both indexes
+    with _lock:
+        conn = _connect()
+        user = conn.execute(
+            "SELECT * FROM users WHERE username = ?", (credentials.username,)
+        ).fetchone()
+        if user is None:
+            user = conn.execute(
+                "SELECT * FROM users WHERE email = ?", (credentials.username,)
+            ).fetchone()
+
     if not user:
+        # Same bcrypt cost as a wrong password, so response time does not
+        # reveal which usernames and emails exist
+        bcrypt.checkpw(credentials.password.encode()[:72], _dummy_hash())
         return None
-        
-    if user["password_hash"] == _hash_password(credentials.password):
-        return {
-            "username": found_username,
-            "full_name": user["full_name"],
-            "medical_license_id": user["medical_license_id"],
-            "email": user.get("email", "")
-        }
-    return None
+
+    stored_hash = user["password_hash"]
+    if not _check_password(credentials.password, stored_hash):
+        return None
+
+    if not stored_hash.startswith("$2"):
+        # Upgrade legacy SHA-256 hashes now that we know the password
+        new_hash = _hash_password(credentials.password)
+        with _lock:
+            with _connect() as conn:
+                conn.execute(
+                    "UPDATE users SET password_hash = ? WHERE username = ?",
+                    (new_hash, user["username"])
+                )
+
+    profile = {
+        "username": user["username"],
+        "full_name": user["full_name"],
+        "medical_license_id": user["medical_license_id"],
+        "email": user["email"] or ""
+    }
+    with _lock:
+        _verify_cache[cache_key] = (time.monotonic() + VERIFY_CACHE_TTL, profile)
+        _verify_cache.move_to_end(cache_key)
+        if len(_verify_cache) > VERIFY_CACHE_SIZE:
+            _verify_cache.popitem(last=False)
+    return dict(profile)
@@ -4,14 +4,199 @@ Real-time patient assessment using clinical guidelines and deterministic rules.
 NO model training, NO historical data dependency.
 """
 
-from typing import Dict, List, Tuple
+from typing import Callable, Dict, List, Optional, Tuple, Union
+from dataclasses import dataclass
 from enum import Enum
+import re
+from bisect import bisect_left
+from functools import lru_cache
 
 class RiskLevel(Enum):
     LOW = "Low Risk (0-30)"
     MODERATE = "Moderate Risk (31-60)"
     HIGH = "High Risk (61-100)"
 
+MAX_RISK_SCORE = 100
+
+# Upper bounds (inclusive) of the LOW and MODERATE bands
+RISK_THRESHOLDS = (30, 60)
+RISK_LEVELS = (RiskLevel.LOW, RiskLevel.MODERATE, RiskLevel.HIGH)
+
+RISK_RECOMMENDATIONS = {
+    RiskLevel.LOW: "Continue routine monitoring. Schedule regular physician checkup.",
+    RiskLevel.MODERATE: "Schedule a physician consultation within 24-48 hours. Monitor vitals.",
+    RiskLevel.HIGH: "Seek immediate medical evaluation. Consider emergency assessment if symptoms worsen."
+}
+
+VITALS_SCORE_CAP = 45
+
+@dataclass(slots=True)
+class ParsedVitals:
+    """Numeric vitals parsed once from a vitals dict; None = missing or unparseable"""
+    systolic: Optional[int] = None
+    diastolic: Optional[int] = None
+    spo2: Optional[int] = None
+    hr: Optional[int] = None
+    temp: Optional[float] = None
+
+@lru_cache(maxsize=1024)
+def _parse_bp_str(bp: str) -> Optional[Tuple[int, int]]:
+    try:
+        systolic, diastolic = map(int, bp.split('/'))
+    except ValueError:
+        return None
+    return systolic, diastolic
+
+def parse_bp(bp) -> Optional[Tuple[int, int]]:
+    """(systolic, diastolic) from a "120/80" string, or None if unreadable"""
+    # Readings repeat heavily across a cohort, so parsed strings are cached
+    return _parse_bp_str(bp) if isinstance(bp, str) else None
+
+def parse_vitals(vitals: Dict) -> ParsedVitals:
+    """Parse the "bp" string and numeric readings of a vitals dict once"""
+    parsed = ParsedVitals()
+    bp = parse_bp(vitals.get("bp"))
+    if bp is not None:
+        parsed.systolic, parsed.diastolic = bp
+    if "spo2" in vitals:
+        try:
+            parsed.spo2 = int(vitals["spo2"])
+        except Exception:
+            pass
+    if "hr" in vitals:
+        try:
+            parsed.hr = int(vitals["hr"])
+        except Exception:
+            pass
+    if "temp" in vitals:
+        try:
+            parsed.temp = float(vitals["temp"])
+        except Exception:
+            pass
+    return parsed
+
+# Vitals rule ladders: (guard field, rules). Each rule is (conditions, score,
+# finding); conditions are OR-ed (field, op, threshold) tests, and the first
+# matching rule of a ladder wins, like an if/elif chain.
+VITALS_RULES = {
+    "cap": VITALS_SCORE_CAP,
+    "ladders": (
+        # Blood Pressure Assessment
+        ("systolic", (
+            ((("systolic", ">=", 180), ("diastolic", ">=", 120)), 25,
+             "🔴 CRITICAL: Hypertensive crisis (BP > 180/120)"),
+            ((("systolic", ">=", 160), ("diastolic", ">=", 100)), 15,
+             "🟠 HIGH: Stage 2 hypertension (BP 160-179/100-109)"),
+            ((("systolic", ">=", 140), ("diastolic", ">=", 90)), 8,
+             "🟡 MODERATE: Stage 1 hypertension (BP 140-159/90-99)"),
+            ((("systolic", "<", 90), ("diastolic", "<", 60)), 12,
+             "🟡 MODERATE: Hypotension (BP < 90/60)"),
+        )),
+        # Oxygen Saturation Assessment (SpO2)
+        ("spo2", (
+            ((("spo2", "<", 90),), 20, "🔴 CRITICAL: Severe hypoxemia (SpO2 < 90%)"),
+            ((("spo2", "<", 94),), 12, "🟠 HIGH: Hypoxemia (SpO2 < 94%)"),
+            ((("spo2", "<", 95),), 5, "🟡 MODERATE: Low oxygen saturation (SpO2 < 95%)"),
+        )),
+        # Heart Rate Assessment
+        ("hr", (
+            ((("hr", ">", 130),), 10, "🟠 HIGH: Severe tachycardia (HR > 130)"),
+            ((("hr", ">", 120),), 6, "🟡 MODERATE: Tachycardia (HR > 120)"),
+            ((("hr", "<", 50),), 8, "🟡 MODERATE: Bradycardia (HR < 50)"),
+        )),
+        # Temperature Assessment
+        ("temp", (
+            ((("temp", ">", 39.5),), 8, "🟠 HIGH: Severe fever (Temp > 39.5°C)"),
+            ((("temp", ">", 38.5),), 5, "🟡 MODERATE: Fever (Temp > 38.5°C)"),
+            ((("temp", "<", 35),), 8, "🟡 MODERATE: Hypothermia (Temp < 35°C)"),
+        )),
+    ),
+}
+
+_SCORER_OPS = frozenset({"<", "<=", ">", ">="})
+_scorer_cache: Dict[str, Callable] = {}
+
+def build_scorer(rules_config: Dict) -> Callable[[ParsedVitals], Tuple[int, List[str]]]:
+    """
+    Compile a rules config (see VITALS_RULES) into one flat Python function
+    with the thresholds inlined as constants. Compiled functions are cached
+    per config.
+    """
+    key = repr(rules_config)
+    scorer = _scorer_cache.get(key)
+    if scorer is not None:
+        return scorer
+
+    fields = ParsedVitals.__slots__
+    lines = ["def _score(v):", "    s = 0", "    f = []"]
+    lines += [f"    {name} = v.{name}" for name in fields]
+    for guard, rules in rules_config["ladders"]:
+        if guard not in fields:
+            raise ValueError(f"Unknown vitals field: {guard}")
+        lines.append(f"    if {guard} is not None:")
+        for i, (conditions, score, finding) in enumerate(rules):
+            tests = []
+            for field, op, threshold in conditions:
+                if field not in fields or op not in _SCORER_OPS:
+                    raise ValueError(f"Invalid rule condition: {field} {op} {threshold}")
+                tests.append(f"{field} {op} {float(threshold)!r}")
+            lines.append(f"        {'if' if i == 0 else 'elif'} {' or '.join(tests)}:")
+            lines.append(f"            s += {int(score)}")
+            lines.append(f"            f.append({str(finding)!r})")
+    lines.append(f"    return min(s, {int(rules_config['cap'])}), f")
+
+    namespace = {}
+    exec(compile("\n".join(lines), "<vitals scorer>", "exec"), namespace)
+    scorer = _scorer_cache[key] = namespace["_score"]
+    return scorer
+
+_score_vitals = build_scorer(VITALS_RULES)
+
+def normalize_strings(xs: Optional[List[str]]) -> Tuple[str, ...]:
+    """Lowercase a symptom/condition list once for all evaluators"""
+    return tuple(x.lower() for x in xs) if xs else ()
+
+
+# Symptom groups: any exact (lower-cased) match adds the score and finding
+SYMPTOM_RULES = (
+    (frozenset({"chest pain", "shortness of breath"}), 18,
+     "🔴 CRITICAL: Potential cardiac event symptoms detected"),
+    (frozenset({"severe headache", "confusion", "altered mental status"}), 15,
+     "🔴 CRITICAL: Possible neurological emergency"),
+    (frozenset({"difficulty breathing", "severe cough"}), 12,
+     "🟠 HIGH: Respiratory distress signs"),
+    (frozenset({"severe pain", "acute pain"}), 10,
+     "🟠 HIGH: Acute pain episode"),
+    (frozenset({"dizziness", "fainting", "syncope"}), 10,
+     "🟠 HIGH: Hemodynamic instability risk"),
+    (frozenset({"persistent vomiting", "vomiting blood"}), 8,
+     "🟡 MODERATE: GI distress with dehydration risk"),
+)
+
+HIGH_RISK_CONDITIONS = {
+    "diabetes": 6,
+    "hypertension": 5,
+    "heart disease": 8,
+    "cardiac": 8,
+    "copd": 7,
+    "asthma": 5,
+    "kidney disease": 7,
+    "liver disease": 8,
+    "cancer": 6,
+    "stroke history": 7,
+    "hiv": 8,
+    "immunocompromised": 8
+}
+
+# One-pass multi-pattern scan for HIGH_RISK_CONDITIONS: the lookahead makes
+# finditer report every condition occurring at each position, including
+# overlapping ones, so the comorbidity text is scanned once instead of once
+# per condition. (No condition is a prefix of another, so one match per
+# start position is enough.)
+_CONDITION_PATTERN = re.compile(
+    "(?=(" + "|".join(map(re.escape, HIGH_RISK_CONDITIONS)) + "))"
+)
+
 class ClinicalRulesEngine:
     """
     Deterministic clinical rule engine based on medical guidelines.
@@ -19,86 +204,15 @@ class ClinicalRulesEngine:
     """
     
     @staticmethod
-    def evaluate_vitals_risk(vitals: Dict) -> Tuple[int, List[str]]:
+    def evaluate_vitals_risk(vitals: Union[Dict, ParsedVitals]) -> Tuple[int, List[str]]:
         """
         Evaluate risk from vital signs using clinical guidelines.
+        Accepts a vitals dict or an already parsed ParsedVitals.
         Returns: (risk_score, list of concerning findings)
         """
-        risk_score = 0
-        findings = []
-        
-        # Blood Pressure Assessment
-        if "bp" in vitals:
-            try:
-                systolic, diastolic = map(int, vitals["bp"].split('/'))
-                
-                if systolic >= 180 or diastolic >= 120:
-                    risk_score += 25
-                    findings.append("🔴 CRITICAL: Hypertensive crisis (BP > 180/120)")
-                elif systolic >= 160 or diastolic >= 100:
-                    risk_score += 15
-                    findings.append("🟠 HIGH: Stage 2 hypertension (BP 160-179/100-109)")
-                elif systolic >= 140 or diastolic >= 90:
-                    risk_score += 8
-                    findings.append("🟡 MODERATE: Stage 1 hypertension (BP 140-159/90-99)")
-                elif systolic < 90 or diastolic < 60:
-                    risk_score += 12
-                    findings.append("🟡 MODERATE: Hypotension (BP < 90/60)")
-            except Exception as e:
-                pass
-        
-        # Oxygen Saturation Assessment (SpO2)
-        if "spo2" in vitals:
-            try:
-                spo2 = int(vitals["spo2"])
-                
-                if spo2 < 90:
-                    risk_score += 20
-                    findings.append("🔴 CRITICAL: Severe hypoxemia (SpO2 < 90%)")
-                elif spo2 < 94:
-                    risk_score += 12
-                    findings.append("🟠 HIGH: Hypoxemia (SpO2 < 94%)")
-                elif spo2 < 95:
-                    risk_score += 5
-                    findings.append("🟡 MODERATE: Low oxygen saturation (SpO2 < 95%)")
-            except Exception as e:
-                pass
-        
-        # Heart Rate Assessment
-        if "hr" in vitals:
-            try:
-                hr = int(vitals["hr"])
-                
-                if hr > 130:
-                    risk_score += 10
-                    findings.append("🟠 HIGH: Severe tachycardia (HR > 130)")
-                elif hr > 120:
-                    risk_score += 6
-                    findings.append("🟡 MODERATE: Tachycardia (HR > 120)")
-                elif hr < 50:
-                    risk_score += 8
-                    findings.append("🟡 MODERATE: Bradycardia (HR < 50)")
-            except Exception as e:
-                pass
-        
-        # Temperature Assessment
-        if "temp" in vitals:
-            try:
-                temp = float(vitals["temp"])
-                
-                if temp > 39.5:
-                    risk_score += 8
-                    findings.append("🟠 HIGH: Severe fever (Temp > 39.5°C)")
-                elif temp > 38.5:
-                    risk_score += 5
-                    findings.append("🟡 MODERATE: Fever (Temp > 38.5°C)")
-                elif temp < 35:
-                    risk_score += 8
-                    findings.append("🟡 MODERATE: Hypothermia (Temp < 35°C)")
-            except Exception as e:
-                pass
-        
-        return min(risk_score, 45), findings  # Cap at 45 from vitals
+        if not isinstance(vitals, ParsedVitals):
+            vitals = parse_vitals(vitals)
+        return _score_vitals(vitals)
 
     @staticmethod
     def evaluate_bmi_risk(bmi_val) -> Tuple[int, List[str]]:
@@ -118,10 +232,11 @@ class ClinicalRulesEngine:
             return 0, []
     
     @staticmethod
-    def evaluate_symptoms_risk(symptoms: List[str]) -> Tuple[int, List[str]]:
+    def evaluate_symptoms_risk(symptoms: Tuple[str, ...]) -> Tuple[int, List[str]]:
         """
         Evaluate risk based on symptom combination.
         Critical symptom combinations trigger high-risk flags.
+        Expects symptoms already lowercased by normalize_strings.
         """
         risk_score = 0
         findings = []
@@ -129,32 +244,10 @@ class ClinicalRulesEngine:
         if not symptoms:
             return 0, []
         
-        symptoms_lower = [s.lower() for s in symptoms]
-        
-        # Critical combinations
-        if any(s in symptoms_lower for s in ["chest pain", "shortness of breath"]):
-            risk_score += 18
-            findings.append("🔴 CRITICAL: Potential cardiac event symptoms detected")
-        
-        if any(s in symptoms_lower for s in ["severe headache", "confusion", "altered mental status"]):
-            risk_score += 15
-            findings.append("🔴 CRITICAL: Possible neurological emergency")
-        
-        if any(s in symptoms_lower for s in ["difficulty breathing", "severe cough"]):
-            risk_score += 12
-            findings.append("🟠 HIGH: Respiratory distress signs")
-        
-        if any(s in symptoms_lower for s in ["severe pain", "acute pain"]):
-            risk_score += 10
-            findings.append("🟠 HIGH: Acute pain episode")
-        
-        if any(s in symptoms_lower for s in ["dizziness", "fainting", "syncope"]):
-            risk_score += 10
-            findings.append("🟠 HIGH: Hemodynamic instability risk")
-        
-        if any(s in symptoms_lower for s in ["persistent vomiting", "vomiting blood"]):
-            risk_score += 8
-            findings.append("🟡 MODERATE: GI distress with dehydration risk")
+        for group, score, finding in SYMPTOM_RULES:
+            if not group.isdisjoint(symptoms):
+                risk_score += score
+                findings.append(finding)
         
         return min(risk_score, 40), findings  # Cap at 40 from symptoms
 
@@ -190,9 +283,10 @@ class ClinicalRulesEngine:
         return min(risk_score, 20), findings
     
     @staticmethod
-    def evaluate_demographics_risk(age: int, gender: str, comorbidities: List[str]) -> Tuple[int, List[str]]:
+    def evaluate_demographics_risk(age: int, gender: str, comorbidities: Tuple[str, ...]) -> Tuple[int, List[str]]:
         """
         Evaluate risk based on age and chronic conditions.
+        Expects comorbidities already lowercased by normalize_strings.
         """
         risk_score = 0
         findings = []
@@ -208,56 +302,38 @@ class ClinicalRulesEngine:
             risk_score += 2
             findings.append("Pediatric patient - Requires pediatric assessment")
         
-        # Comorbidity assessment
-        comorbidities_lower = [c.lower() for c in (comorbidities or [])]
+        # Comorbidity assessment: substring match (e.g. "type 2 diabetes"
+        # counts as diabetes), done as one scan over the joined list
+        comorbidities_text = "\n".join(comorbidities or ())
+        matched = {m.group(1) for m in _CONDITION_PATTERN.finditer(comorbidities_text)}
         
-        high_risk_conditions = {
-            "diabetes": 6,
-            "hypertension": 5,
-            "heart disease": 8,
-            "cardiac": 8,
-            "copd": 7,
-            "asthma": 5,
-            "kidney disease": 7,
-            "liver disease": 8,
-            "cancer": 6,
-            "stroke history": 7,
-            "hiv": 8,
-            "immunocompromised": 8
-        }
-        
-        for condition, score in high_risk_conditions.items():
-            if any(condition in c for c in comorbidities_lower):
-                risk_score += score
-                findings.append(f"⚠️ Chronic condition: {condition.title()}")
+        if matched:
+            for condition, score in HIGH_RISK_CONDITIONS.items():
+                if condition in matched:
+                    risk_score += score
+                    findings.append(f"⚠️ Chronic condition: {condition.title()}")
         
         return min(risk_score, 30), findings  # Cap at 30 from demographics
 
     @staticmethod
-    def evaluate_critical_combinations(vitals: Dict, symptoms: List[str]) -> List[str]:
-        """Check for specific dangerous clinical combinations"""
+    def evaluate_critical_combinations(vitals: Union[Dict, ParsedVitals], symptoms: Tuple[str, ...]) -> List[str]:
+        """Check for specific dangerous clinical combinations (symptoms lowercased)"""
+        if not isinstance(vitals, ParsedVitals):
+            vitals = parse_vitals(vitals)
         critical_alerts = []
-        symptoms_lower = [s.lower() for s in symptoms]
         
         # BP Criticals
-        if "bp" in vitals:
-            try:
-                systolic, diastolic = map(int, vitals["bp"].split('/'))
-                if systolic > 180 or diastolic > 120:
-                    if "chest pain" in symptoms_lower:
-                        critical_alerts.append("🚨 CARDIAC ALERT: Hypertensive crisis with chest pain - IMMEDIATE EVALUATION")
-                    else:
-                        critical_alerts.append("🚨 EMERGENT: Hypertensive crisis (BP > 180/120)")
-            except: pass
+        if vitals.systolic is not None:
+            if vitals.systolic > 180 or vitals.diastolic > 120:
+                if "chest pain" in symptoms:
+                    critical_alerts.append("🚨 CARDIAC ALERT: Hypertensive crisis with chest pain - IMMEDIATE EVALUATION")
+                else:
+                    critical_alerts.append("🚨 EMERGENT: Hypertensive crisis (BP > 180/120)")
             
         # Respiratory Criticals
-        if "spo2" in vitals and "temp" in vitals:
-            try:
-                spo2 = int(vitals["spo2"])
-                temp = float(vitals["temp"])
-                if spo2 < 90 and (temp > 38.0 or "cough" in symptoms_lower):
-                    critical_alerts.append("🚨 INFECTION RISK: Hypoxemia with fever/cough - Possible pneumonia/sepsis")
-            except: pass
+        if vitals.spo2 is not None and vitals.temp is not None:
+            if vitals.spo2 < 90 and (vitals.temp > 38.0 or "cough" in symptoms):
+                critical_alerts.append("🚨 INFECTION RISK: Hypoxemia with fever/cough - Possible pneumonia/sepsis")
             
         return critical_alerts
     
@@ -269,15 +345,10 @@ class ClinicalRulesEngine:
         Total range: 0-100
         """
         total_score = vitals_score + bmi_score + symptoms_score + demographics_score + lifestyle_score
-        total_score = min(total_score, 100)
+        total_score = min(total_score, MAX_RISK_SCORE)
         
-        # Classification
-        if total_score <= 30:
-            level = RiskLevel.LOW
-        elif total_score <= 60:
-            level = RiskLevel.MODERATE
-        else:
-            level = RiskLevel.HIGH
+        # Classification (bisect_left keeps 30 and 60 in the lower band)
+        level = RISK_LEVELS[bisect_left(RISK_THRESHOLDS, total_score)]
         
         return total_score, level, {
             "vitals_contribution": vitals_score,
@@ -292,11 +363,5 @@ class ClinicalRulesEngine:
         """
         Generate safe, non-diagnostic recommendations.
         """
-        recommendations = {
-            RiskLevel.LOW: "Continue routine monitoring. Schedule regular physician checkup.",
-            RiskLevel.MODERATE: "Schedule a physician consultation within 24-48 hours. Monitor vitals.",
-            RiskLevel.HIGH: "Seek immediate medical evaluation. Consider emergency assessment if symptoms worsen."
-        }
-        
-        return recommendations.get(risk_level, "Consult with healthcare provider")
+        return RISK_RECOMMENDATIONS.get(risk_level, "Consult with healthcare provider")
 
@@ -4,6 +4,7 @@ Pre-configured patient scenarios showing different risk levels
 """
 
 from datetime import datetime
+import time
 
 DEMO_PATIENTS = [
     {
@@ -80,6 +81,9 @@ DEMO_PATIENTS = [
     }
 ]
 
+_DEMO_BY_ID = {p["patient_id"]: p for p in DEMO_PATIENTS}
+
+
 DEMO_ALERTS = {
     "demo_critical_001": {
         "critical_alerts": [
@@ -183,10 +187,7 @@ def get_demo_patient(patient_id: str = None):
     if not patient_id:
         return DEMO_PATIENTS[0]  # Default: Critical patient
     
-    for patient in DEMO_PATIENTS:
-        if patient["patient_id"] == patient_id:
-            return patient
-    return None
+    return _DEMO_BY_ID.get(patient_id)
 
 
 def get_all_demo_patients():
@@ -207,15 +208,16 @@ def get_demo_alerts(patient_id: str):
 
 def create_sos_alert(patient_id: str, patient_name: str):
     """Create an emergency SOS alert"""
+    ts = time.time_ns()  # one clock read for both the id and the timestamp
     return {
-        "alert_id": f"{patient_id}_sos_{int(datetime.now().timestamp())}",
+        "alert_id": f"{patient_id}_sos_{ts // 1_000_000_000}",
         "patient_id": patient_id,
         "patient_name": patient_name,
         "alert_level": "CRITICAL",
         "message": f"🆘 EMERGENCY SOS ACTIVATED by patient {patient_name}",
         "urgency": "🚨 CRITICAL - Immediate Medical Evaluation Required",
         "severity_color": "#ef4444",
-        "timestamp": datetime.now().isoformat(),
+        "timestamp": datetime.fromtimestamp(ts / 1e9).isoformat(),
         "status": "alert_created"
     }
 
@@ -3,12 +3,23 @@ Emergency Alert System for MedAssist
 Handles critical patient alerts with multi-channel notifications
 """
 
+from collections import defaultdict
 from datetime import datetime
 from enum import Enum
 from typing import List, Optional
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, PrivateAttr
 import asyncio
-import json
+import logging
+import os
+import queue
+import threading
+import time
+import orjson
+
+logger = logging.getLogger(__name__)
+
+# Add the old 100 ms notification delay back (demos, timing tests)
+SIMULATE_NOTIFY = os.getenv("SIMULATE_NOTIFY", "0") == "1"
 
 class AlertLevel(str, Enum):
     CRITICAL = "CRITICAL"      # Red - immediate action required
@@ -17,6 +28,21 @@ class AlertLevel(str, Enum):
     NORMAL = "NORMAL"            # Green - all okay
 
 
+SEVERITY_COLORS = {
+    AlertLevel.CRITICAL: "#ef4444",  # Red
+    AlertLevel.WARNING: "#f59e0b",   # Orange
+    AlertLevel.INFO: "#3b82f6",      # Blue
+    AlertLevel.NORMAL: "#10b981"     # Green
+}
+
+URGENCY_TEXTS = {
+    AlertLevel.CRITICAL: "🚨 CRITICAL - Immediate Medical Evaluation Required",
+    AlertLevel.WARNING: "⚠️ WARNING - Urgent Physician Attention Needed",
+    AlertLevel.INFO: "ℹ️ INFO - Monitor Patient Closely",
+    AlertLevel.NORMAL: "✅ NORMAL - Continue Routine Care"
+}
+
+
 class VitalSigns(BaseModel):
     heart_rate: int
     blood_pressure: str
@@ -32,38 +58,155 @@ class EmergencyAlert(BaseModel):
     message: str
     vitals: Optional[VitalSigns] = None
     risk_score: Optional[int] = None
-    created_at: datetime = None
+    # default_factory (not an __init__ override) so model_construct sets it too
+    created_at: datetime = Field(default_factory=datetime.now)
     resolved: bool = False
 
-    def __init__(self, **data):
-        super().__init__(**data)
-        if self.created_at is None:
-            self.created_at = datetime.now()
+    _cached_dict: Optional[dict] = PrivateAttr(default=None)
+
+    def as_dict(self) -> dict:
+        """JSON-ready dict of the alert, computed once (reset when resolved)"""
+        if self._cached_dict is None:
+            self._cached_dict = self.model_dump(mode="json")
+        return dict(self._cached_dict)
 
     def get_severity_color(self) -> str:
         """Get color code for alert level"""
-        colors = {
-            AlertLevel.CRITICAL: "#ef4444",  # Red
-            AlertLevel.WARNING: "#f59e0b",   # Orange
-            AlertLevel.INFO: "#3b82f6",      # Blue
-            AlertLevel.NORMAL: "#10b981"     # Green
-        }
-        return colors.get(self.alert_level, "#6b7280")
+        return SEVERITY_COLORS.get(self.alert_level, "#6b7280")
 
     def get_urgency_text(self) -> str:
         """Get human-readable urgency message"""
-        urgencies = {
-            AlertLevel.CRITICAL: "🚨 CRITICAL - Immediate Medical Evaluation Required",
-            AlertLevel.WARNING: "⚠️ WARNING - Urgent Physician Attention Needed",
-            AlertLevel.INFO: "ℹ️ INFO - Monitor Patient Closely",
-            AlertLevel.NORMAL: "✅ NORMAL - Continue Routine Care"
-        }
-        return urgencies.get(self.alert_level, "Status Unknown")
+        return URGENCY_TEXTS.get(self.alert_level, "Status Unknown")
 
 
 # In-memory alert storage (in production, use database)
 ACTIVE_ALERTS: dict = {}
 ALERT_HISTORY: list = []
+# Per-patient views of ALERT_HISTORY, maintained by create_alert/resolve_alert
+_ALERTS_BY_PATIENT: defaultdict = defaultdict(list)
+_ACTIVE_CRITICAL_COUNT: dict = {}
+
+
+# Optional durable alert log: one JSON line per created/resolved alert.
+# Unset = in-memory only, as before.
+ALERT_LOG_PATH = os.getenv("ALERT_LOG_PATH")
+ALERT_LOG_BATCH = 32            # lines per write()+fsync
+ALERT_LOG_FLUSH_INTERVAL = 0.001  # seconds to wait for more lines before writing
+
+
+class AlertLogWriter:
+    """
+    Append-only JSONL alert log written by one background thread.
+    Lines arriving together (up to ALERT_LOG_BATCH, within
+    ALERT_LOG_FLUSH_INTERVAL) share a single write and fsync, so a burst of
+    SOS alerts does not serialize on one fsync per alert.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        # Opened here so an unwritable ALERT_LOG_PATH fails at startup
+        self._file = open(path, "ab")
+        self._queue = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="alert-log", daemon=True)
+        self._thread.start()
+
+    def write(self, record: dict) -> asyncio.Future:
+        """Queue a record; the returned future resolves once it is on disk,
+        or fails with the error that kept it off disk"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._put((orjson.dumps(record) + b"\n", loop, future))
+        return future
+
+    def write_nowait(self, record: dict):
+        """Queue a record without waiting for it (for sync callers)"""
+        self._put((orjson.dumps(record) + b"\n", None, None))
+
+    def close(self):
+        """Flush queued records and stop the writer thread"""
+        self._queue.put(None)
+        self._thread.join()
+
+    def _put(self, item):
+        with self._lock:
+            if self._stopped:
+                raise RuntimeError("Alert log writer is not running")
+            self._queue.put(item)
+
+    def _run(self):
+        try:
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    return
+                batch = [item]
+                deadline = time.monotonic() + ALERT_LOG_FLUSH_INTERVAL
+                stop = False
+                while len(batch) < ALERT_LOG_BATCH:
+                    timeout = deadline - time.monotonic()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = self._queue.get(timeout=timeout)
+                    except queue.Empty:
+                        break
+                    if item is None:
+                        stop = True
+                        break
+                    batch.append(item)
+                error = None
+                try:
+                    self._file.writelines(line for line, _, _ in batch)
+                    self._file.flush()
+                    os.fsync(self._file.fileno())
+                except OSError as e:
+                    logger.error(f"Alert log write failed: {str(e)}")
+                    error = e
+                for _, loop, future in batch:
+                    _notify(loop, future, error)
+                if stop:
+                    return
+        finally:
+            with self._lock:
+                self._stopped = True
+            self._file.close()
+            # Nothing still queued will be written now
+            while True:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not None:
+                    _notify(item[1], item[2], RuntimeError("Alert log writer stopped"))
+
+
+def _notify(loop, future, error):
+    """Settle a writer future from the writer thread"""
+    if future is None:
+        return
+    try:
+        loop.call_soon_threadsafe(_settle, future, error)
+    except RuntimeError:
+        pass  # event loop already closed
+
+
+def _settle(future: asyncio.Future, error=None):
+    if future.done():
+        return
+    if error is None:
+        future.set_result(None)
+    else:
+        future.set_exception(error)
+
+
+alert_log = AlertLogWriter(ALERT_LOG_PATH) if ALERT_LOG_PATH else None
+
+
+def close_alert_log():
+    if alert_log is not None:
+        alert_log.close()
 
 
 async def create_alert(alert: EmergencyAlert) -> dict:
@@ -71,96 +214,133 @@ async def create_alert(alert: EmergencyAlert) -> dict:
     Create an emergency alert and trigger notifications
     """
     alert_id = f"{alert.patient_id}_{int(alert.created_at.timestamp())}"
+    created_iso = alert.created_at.isoformat()
     
     ACTIVE_ALERTS[alert_id] = alert
     ALERT_HISTORY.append(alert)
+    _ALERTS_BY_PATIENT[alert.patient_id].append(alert)
+    if alert.alert_level == AlertLevel.CRITICAL:
+        _ACTIVE_CRITICAL_COUNT[alert.patient_id] = _ACTIVE_CRITICAL_COUNT.get(alert.patient_id, 0) + 1
     
-    # Log critical alerts
+    # Log critical alerts as one structured line
     if alert.alert_level == AlertLevel.CRITICAL:
-        print(f"\n{'='*60}")
-        print(f"🚨 CRITICAL ALERT TRIGGERED")
-        print(f"{'='*60}")
-        print(f"Patient: {alert.patient_name} ({alert.patient_id})")
-        print(f"Message: {alert.message}")
-        if alert.risk_score:
-            print(f"Risk Score: {alert.risk_score}/100")
-        print(f"Time: {alert.created_at}")
-        print(f"{'='*60}\n")
+        logger.warning(
+            "🚨 CRITICAL ALERT: %s (%s) - %s | risk=%s | time=%s",
+            alert.patient_name, alert.patient_id, alert.message,
+            alert.risk_score, created_iso,
+            extra={
+                "patient_id": alert.patient_id,
+                "risk_score": alert.risk_score,
+                "ts": created_iso
+            }
+        )
     
     # Trigger notifications (would integrate with email/SMS in production)
-    await notify_doctor(alert)
-    await notify_family(alert)
+    # while the alert is persisted
+    pending = [notify_doctor(alert), notify_family(alert)]
+    if alert_log is not None:
+        pending.append(_log_created(alert_id, alert))
+    results = await asyncio.gather(*pending)
     
-    return {
+    response = {
         "alert_id": alert_id,
         "status": "alert_created",
         "urgency": alert.get_urgency_text(),
         "severity_color": alert.get_severity_color(),
-        "timestamp": alert.created_at.isoformat()
+        "timestamp": created_iso
     }
+    if alert_log is not None:
+        response["persisted"] = results[-1]
+    return response
+
+
+async def _log_created(alert_id: str, alert: EmergencyAlert) -> bool:
+    """Write a created alert to the alert log; False if it did not reach disk"""
+    # The alert is live in memory either way, so a log failure is reported
+    # rather than failing the request
+    try:
+        await alert_log.write({"event": "created", "alert_id": alert_id, **alert.as_dict()})
+        return True
+    except (OSError, RuntimeError) as e:
+        logger.error(f"Alert {alert_id} not logged: {str(e)}")
+        return False
 
 
 async def notify_doctor(alert: EmergencyAlert) -> bool:
     """Send notification to doctor (email/SMS in production)"""
-    print(f"📧 Notifying doctor about {alert.patient_name}'s {alert.alert_level} alert...")
+    logger.info("📧 Notifying doctor about %s's %s alert", alert.patient_name, alert.alert_level.value)
     # In production: send_email(doctor_email, alert_message)
     # In production: send_sms(doctor_phone, alert_message)
-    await asyncio.sleep(0.1)  # Simulate async notification
+    if SIMULATE_NOTIFY:
+        await asyncio.sleep(0.1)  # Simulate async notification
     return True
 
 
 async def notify_family(alert: EmergencyAlert) -> bool:
     """Send notification to family members"""
     if alert.alert_level in [AlertLevel.CRITICAL, AlertLevel.WARNING]:
-        print(f"📱 Notifying family members about {alert.patient_name}'s alert...")
+        logger.info("📱 Notifying family members about %s's alert", alert.patient_name)
         # In production: send_sms(family_phone, alert_message)
-        await asyncio.sleep(0.1)  # Simulate async notification
+        if SIMULATE_NOTIFY:
+            await asyncio.sleep(0.1)  # Simulate async notification
     return True
 
 
 def get_patient_alerts(patient_id: str) -> dict:
     """Get all alerts for a specific patient"""
-    patient_alerts = [
-        alert for alert in ALERT_HISTORY 
-        if alert.patient_id == patient_id
-    ]
+    patient_alerts = _ALERTS_BY_PATIENT.get(patient_id, ())
     
-    critical = [a for a in patient_alerts if a.alert_level == AlertLevel.CRITICAL]
-    warning = [a for a in patient_alerts if a.alert_level == AlertLevel.WARNING]
-    info = [a for a in patient_alerts if a.alert_level == AlertLevel.INFO]
+    by_level = {AlertLevel.CRITICAL: [], AlertLevel.WARNING: [], AlertLevel.INFO: []}
+    for a in patient_alerts:
+        bucket = by_level.get(a.alert_level)
+        if bucket is not None:
+            bucket.append(a.as_dict())
     
     return {
         "patient_id": patient_id,
-        "critical_alerts": [a.dict() for a in critical],
-        "warning_alerts": [a.dict() for a in warning],
-        "info_alerts": [a.dict() for a in info],
+        "critical_alerts": by_level[AlertLevel.CRITICAL],
+        "warning_alerts": by_level[AlertLevel.WARNING],
+        "info_alerts": by_level[AlertLevel.INFO],
         "total_alerts": len(patient_alerts),
-        "active_critical": len([a for a in critical if not a.resolved])
+        "active_critical": _ACTIVE_CRITICAL_COUNT.get(patient_id, 0)
     }
 
 
 def resolve_alert(alert_id: str) -> bool:
     """Mark alert as resolved"""
-    if alert_id in ACTIVE_ALERTS:
-        ACTIVE_ALERTS[alert_id].resolved = True
-        del ACTIVE_ALERTS[alert_id]
+    alert = ACTIVE_ALERTS.pop(alert_id, None)
+    if alert is not None:
+        alert.resolved = True
+        alert._cached_dict = None
+        if alert.alert_level == AlertLevel.CRITICAL:
+            _ACTIVE_CRITICAL_COUNT[alert.patient_id] -= 1
+        if alert_log is not None:
+            try:
+                alert_log.write_nowait({
+                    "event": "resolved",
+                    "alert_id": alert_id,
+                    "resolved_at": datetime.now().isoformat()
+                })
+            except RuntimeError as e:
+                logger.error(f"Resolution of alert {alert_id} not logged: {str(e)}")
         return True
     return False
 
 
 def get_active_alerts() -> list:
     """Get all currently active alerts"""
-    return [
-        {
+    active = []
+    for alert_id, alert in ACTIVE_ALERTS.items():
+        data = alert.as_dict()
+        active.append({
             "alert_id": alert_id,
-            "patient_id": alert.patient_id,
-            "patient_name": alert.patient_name,
-            "alert_level": alert.alert_level,
-            "message": alert.message,
-            "risk_score": alert.risk_score,
-            "created_at": alert.created_at.isoformat(),
+            "patient_id": data["patient_id"],
+            "patient_name": data["patient_name"],
+            "alert_level": data["alert_level"],
+            "message": data["message"],
+            "risk_score": data["risk_score"],
+            "created_at": data["created_at"],
             "urgency_text": alert.get_urgency_text(),
             "severity_color": alert.get_severity_color()
-        }
-        for alert_id, alert in ACTIVE_ALERTS.items()
-    ]
+        })
+    return active
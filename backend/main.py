@@ -1,21 +1,31 @@
 import os
-# Updated CORS origins to support port 5174
-import json
-from fastapi import FastAPI, HTTPException, UploadFile, File
+import asyncio
+from fastapi import FastAPI, HTTPException, Request, UploadFile, File
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
 from dotenv import load_dotenv
 from pathlib import Path
-from typing import List
+from datetime import datetime
+from types import MappingProxyType
+from typing import List, Optional
+from contextlib import asynccontextmanager
+from concurrent.futures import ProcessPoolExecutor
 import shutil
+import io
+import hashlib
+import orjson
+import patient_store
+from pydantic import BaseModel
 from models import PatientRecord, AIHistorySummary, LabResult, ScanResult
-from ai_service import get_gemini_summary, analyze_medical_report
-from safety_engine import check_vital_safety, check_lab_safety, check_drug_interactions
+from ai_service import get_gemini_summary, get_gemini_summaries_batch, analyze_medical_report, generate_soap_note, stream_soap_note, close_http_client
+from safety_engine import triage_pass
 from clinical_rules_engine import ClinicalRulesEngine, RiskLevel
 from risk_assessment import ClinicalDecisionSupport, RiskScorer
-from emergency_alerts import EmergencyAlert, AlertLevel, create_alert, get_patient_alerts, resolve_alert, get_active_alerts, VitalSigns
+from emergency_alerts import EmergencyAlert, AlertLevel, create_alert, get_patient_alerts, resolve_alert, get_active_alerts, VitalSigns, close_alert_log
 from demo_scenarios import DEMO_PATIENTS, DEMO_ALERTS, get_demo_patient, get_all_demo_patients, get_demo_alerts
-import traceback
 import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
 import auth
 from auth import UserSignup, UserLogin, create_user, verify_user
 
@@ -23,14 +33,49 @@ from auth import UserSignup, UserLogin, create_user, verify_user
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Endpoint hit log: handlers only enqueue records; a listener thread does
+# the file writes, so requests never block on disk I/O
+hit_log_queue = queue.SimpleQueue()
+hit_logger = logging.getLogger("endpoint_hits")
+hit_logger.setLevel(logging.INFO)
+hit_logger.propagate = False
+hit_logger.addHandler(QueueHandler(hit_log_queue))
+# Resolved once; every file path below hangs off this directory
+backend_dir = Path(__file__).resolve().parent
+
+hit_log_listener = QueueListener(hit_log_queue, logging.FileHandler(backend_dir / "endpoint_hits.log", delay=True))
+
 # Load .env from the backend directory
-backend_dir = Path(__file__).parent
 load_dotenv(backend_dir / ".env")
 
+# Worker processes for the rules assessment (0 = run it in threads). Lets
+# concurrent analyses, e.g. a /analyze-patients batch, use several cores
+ANALYZE_PROCESS_WORKERS = int(os.getenv("ANALYZE_PROCESS_WORKERS", "0"))
+_process_pool: Optional[ProcessPoolExecutor] = None
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global _process_pool
+    hit_log_listener.start()
+    compactor = asyncio.create_task(patient_store.compact_periodically())
+    if ANALYZE_PROCESS_WORKERS > 0:
+        _process_pool = ProcessPoolExecutor(max_workers=ANALYZE_PROCESS_WORKERS)
+    yield
+    compactor.cancel()
+    if _process_pool is not None:
+        _process_pool.shutdown(cancel_futures=True)
+    await patient_store.compact()  # fold pending patient changes into patients.json
+    hit_log_listener.stop()  # flushes queued records
+    close_alert_log()
+    # Release pooled API connections on shutdown
+    await close_http_client()
+
 app = FastAPI(
     title="MedAssist Clinical Decision Support API",
     description="For physician review only - Not for diagnostic use",
-    version="2.0.0"
+    version="2.0.0",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
 # Configure CORS for React frontend
@@ -45,89 +90,160 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+_allowed_origin_set = frozenset(allowed_origins)
+
+@app.exception_handler(Exception)
+async def unhandled_exception_handler(request: Request, exc: Exception):
+    """Log any uncaught endpoint error and answer with a 500 (HTTPExceptions are handled by FastAPI)"""
+    logger.exception(f"Unhandled error in {request.method} {request.url.path}: {str(exc)}")
+    response = ORJSONResponse({"detail": str(exc)}, status_code=500)
+    # Starlette runs this handler outside CORSMiddleware, so add the CORS
+    # headers here or the frontend only sees an opaque CORS failure
+    origin = request.headers.get("origin")
+    if origin and (origin in _allowed_origin_set or "*" in _allowed_origin_set):
+        response.headers["Access-Control-Allow-Origin"] = origin
+        response.headers["Access-Control-Allow-Credentials"] = "true"
+        response.headers["Vary"] = "Origin"
+    return response
+
+# Constant responses, serialized once at import
+_ROOT_BYTES = orjson.dumps({
+    "message": "MedAssist Clinical Decision Support API",
+    "version": "2.0.0",
+    "disclaimer": "For physician review only",
+    "docs": "/docs"
+})
+
+_HEALTH_BYTES = orjson.dumps({
+    "status": "healthy",
+    "service": "MedAssist Backend",
+    "version": "2.0.0"
+})
+
 @app.get("/")
 async def root():
-    return {
-        "message": "MedAssist Clinical Decision Support API",
-        "version": "2.0.0",
-        "disclaimer": "For physician review only",
-        "docs": "/docs"
-    }
+    return Response(_ROOT_BYTES, media_type="application/json")
 
 @app.get("/health")
 async def health_check():
-    return {
-        "status": "healthy",
-        "service": "MedAssist Backend",
-        "version": "2.0.0"
-    }
+    return Response(_HEALTH_BYTES, media_type="application/json")
 
 @app.post("/signup")
 async def signup(user: UserSignup):
-    if create_user(user):
+    # bcrypt hashing is CPU-bound; run it off the event loop
+    if await asyncio.to_thread(create_user, user):
         return {"status": "success", "message": "User created successfully"}
     else:
         raise HTTPException(status_code=400, detail="Username already exists")
 
 @app.post("/login")
 async def login(credentials: UserLogin):
-    user = verify_user(credentials)
+    user = await asyncio.to_thread(verify_user, credentials)
     if user:
         return {"status": "success", "user": user}
     else:
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
+# Clients may reuse a cached list this long before revalidating with ETag
+LIST_CACHE_CONTROL = "private, max-age=5"
+
+def _not_modified(request: Request, etag: str) -> bool:
+    """True if the client's If-None-Match already names this ETag"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    return header.strip() == "*" or etag in (tag.strip() for tag in header.split(","))
+
+def _cached_json(request: Request, etag: str, content) -> Response:
+    """304 when the client's copy is current, otherwise the JSON body with its ETag
+    (content may be already-serialized bytes)"""
+    headers = {"ETag": etag, "Cache-Control": LIST_CACHE_CONTROL}
+    if _not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+    if isinstance(content, bytes):
+        return Response(content, media_type="application/json", headers=headers)
+    return ORJSONResponse(content, headers=headers)
+
 @app.get("/patients", response_model=List[dict])
-async def get_patients():
+async def get_patients(request: Request):
     """Get all patients from the database"""
     try:
-        # Resolve path relative to this file
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        patients_path = os.path.join(current_dir, "..", "data", "patients.json")
-        
-        with open(patients_path, "r") as f:
-            patients = json.load(f)
-            
-        return patients
+        version, body = await patient_store.get_patients_json()
     except FileNotFoundError:
         raise HTTPException(status_code=404, detail="Patients database not found")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    return _cached_json(request, f'W/"{version}"', body)
 
-@app.post("/patients", response_model=dict)
-async def create_patient(patient: dict):
-    """Add a new patient to the database"""
+# OpenAPI body schema for handlers that parse their JSON body themselves
+_JSON_OBJECT_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {"application/json": {"schema": {"type": "object"}}}
+    }
+}
+
+_JSON_ARRAY_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {"application/json": {"schema": {"type": "array", "items": {"type": "object"}}}}
+    }
+}
+
+async def _json_body(request: Request, expected: type = dict):
+    """Parse a JSON object (or, with expected=list, array) request body with orjson"""
     try:
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        patients_path = os.path.join(current_dir, "..", "data", "patients.json")
-        
-        with open(patients_path, "r") as f:
-            patients = json.load(f)
-            
-        patients.append(patient)
+        body = orjson.loads(await request.body())
+    except orjson.JSONDecodeError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid JSON body: {e}")
+    if not isinstance(body, expected):
+        kind = "array" if expected is list else "object"
+        raise HTTPException(status_code=422, detail=f"Request body must be a JSON {kind}")
+    return body
+
+@app.post("/patients", response_model=dict, openapi_extra=_JSON_OBJECT_BODY)
+async def create_patient(request: Request):
+    """Add a new patient to the database"""
+    patient = await _json_body(request)
+    if not await patient_store.add_patient(patient):
+        raise HTTPException(status_code=409, detail=f"Patient {patient.get('patient_id')} already exists")
         
-        with open(patients_path, "w") as f:
-            json.dump(patients, f, indent=2)
-            
-        return {"status": "success", "message": "Patient added successfully", "patient_id": patient.get("patient_id")}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    return {"status": "success", "message": "Patient added successfully", "patient_id": patient.get("patient_id")}
+
+@app.delete("/patients/{patient_id}")
+async def delete_patient(patient_id: str):
+    """Delete a patient from the database"""
+    # patient_id is unique, so at most one record is removed
+    if not await patient_store.delete_patient(patient_id):
+        raise HTTPException(status_code=404, detail=f"Patient {patient_id} not found")
+    
+    return {
+        "status": "success", 
+        "message": f"Patient {patient_id} deleted successfully",
+        "deleted_count": 1
+    }
+
+MAX_UPLOAD_BYTES = 20 * 1024 * 1024  # largest report image accepted by /scan-report
 
 @app.post("/scan-report", response_model=ScanResult)
 async def scan_report(file: UploadFile = File(...)):
     """Upload and analyze a medical report image"""
-    try:
-        content = await file.read()
-        # Analyze using Gemini
-        result = analyze_medical_report(content)
-        return result
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Report analysis failed: {str(e)}")
+    # Reject oversized uploads before touching their content
+    if file.size is not None and file.size > MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail="Report image too large")
+    if file.size is not None:
+        # Hand over the spooled upload itself; the image is hashed and
+        # decoded from it without a full in-memory copy
+        image_file = file.file
+    else:
+        content = await file.read(MAX_UPLOAD_BYTES + 1)
+        if len(content) > MAX_UPLOAD_BYTES:
+            raise HTTPException(status_code=413, detail="Report image too large")
+        image_file = io.BytesIO(content)
+    # Analyze using Gemini
+    result = await analyze_medical_report(image_file)
+    return result
 
 @app.post("/generate-soap-note")
 async def generate_soap_note_endpoint(record: dict):
-    with open("endpoint_hits.log", "a") as f:
-        f.write("Hit /generate-soap-note\n")
     """
     Generate a professional clinical SOAP note using AI.
     S: Subjective - Patient's complaints
@@ -135,17 +251,46 @@ async def generate_soap_note_endpoint(record: dict):
     A: Assessment - Clinical reasoning
     P: Plan - Recommendations
     """
-    try:
-        from ai_service import generate_soap_note
-        soap_note = generate_soap_note(record)
-        return {"soap_note": soap_note}
-    except Exception as e:
-        logger.error(f"SOAP note generation failed: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
+    hit_logger.info("Hit /generate-soap-note")
+    soap_note = await generate_soap_note(record)
+    return {"soap_note": soap_note}
+
+@app.post("/generate-soap-note/stream")
+async def stream_soap_note_endpoint(record: dict):
+    """
+    Stream the SOAP note as plain text so the client can render it while it
+    is still being generated.
+    """
+    return StreamingResponse(stream_soap_note(record), media_type="text/plain")
+
+
+# Shared read-only defaults for missing record fields
+_EMPTY_DICT = MappingProxyType({})
+_EMPTY_LIST = ()
 
+ANALYSIS_DISCLAIMER = "This is a decision support tool. All findings require physician validation. Not for diagnostic use."
+
+def _compile_analysis_response(assessment: dict, vital_alerts: list, lab_alerts: list,
+                               drug_alerts: list, summary_dict: dict) -> dict:
+    """Assemble the /analyze-patient response from already-computed parts"""
+    return {
+        "clinical_assessment": assessment,
+        "safety_alerts": {
+            "vitals": vital_alerts,
+            "labs": lab_alerts,
+            "medications": drug_alerts
+        },
+        "ai_interpretation": summary_dict,
+        "workflow": {
+            "requires_immediate_attention": assessment["requires_immediate_attention"],
+            "risk_level": assessment["level"],
+            "next_steps": assessment["recommendation"]
+        },
+        "disclaimer": ANALYSIS_DISCLAIMER
+    }
 
-@app.post("/analyze-patient", response_model=dict)
-async def analyze_patient(record: dict):
+@app.post("/analyze-patient", response_model=dict, openapi_extra=_JSON_OBJECT_BODY)
+async def analyze_patient(request: Request):
     """
     Analyze patient data using clinical rules engine and AI reasoning.
     For physician review only - NOT for diagnostic use.
@@ -155,57 +300,143 @@ async def analyze_patient(record: dict):
     2. Safety checks (vital signs, lab values)
     3. AI-powered clinical reasoning and explanation
     """
-    try:
-        # Step 1: Clinical Risk Assessment (Dataset-Free)
-        risk_assessment = ClinicalDecisionSupport.generate_assessment(record)
-        
-        if not risk_assessment.get("success"):
-            raise Exception(f"Risk assessment failed: {risk_assessment.get('error')}")
-        
-        assessment = risk_assessment["assessment"]
-        
-        # Step 2: Safety Checks
-        vital_alerts = check_vital_safety(record.get('vitals', {}))
-        lab_results_list = record.get('lab_results', [])
-        lab_alerts = check_lab_safety(lab_results_list)
-        medications_list = record.get('current_medications', [])
-        drug_alerts = check_drug_interactions(medications_list)
-        
-        # Step 3: AI Reasoning (Explanation & Interpretation)
+    return await _analyze_record(await _json_body(request))
+
+
+ANALYZE_BATCH_CONCURRENCY = 10  # records analyzed at once by /analyze-patients
+MAX_ANALYZE_BATCH = 100         # records accepted per /analyze-patients request
+
+@app.post("/analyze-patients", response_model=List[dict], openapi_extra=_JSON_ARRAY_BODY)
+async def analyze_patients(request: Request):
+    """
+    Analyze several patient records in one request.
+    Results are returned in input order; a record that fails to analyze gets
+    an "error" entry instead of failing the whole batch.
+    """
+    records = await _json_body(request, list)
+    if len(records) > MAX_ANALYZE_BATCH:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_ANALYZE_BATCH} records per request")
+    if not all(isinstance(r, dict) for r in records):
+        raise HTTPException(status_code=422, detail="Each record must be a JSON object")
+    
+    triaged = []
+    for record in records:
         try:
-            ai_summary = get_gemini_summary(record)
-            summary_dict = ai_summary.dict() if hasattr(ai_summary, 'dict') else ai_summary
+            triaged.append(_triage(record))
         except Exception as e:
-            logger.warning(f"AI summary generation failed: {str(e)}")
-            summary_dict = {"clinical_narrative": "AI summary unavailable"}
-        
-        # Step 4: Compile Response
-        response_data = {
-            "clinical_assessment": assessment,
-            "safety_alerts": {
-                "vitals": vital_alerts,
-                "labs": lab_alerts,
-                "medications": drug_alerts
-            },
-            "ai_interpretation": summary_dict,
-            "workflow": {
-                "requires_immediate_attention": assessment.get("requires_immediate_attention", False),
-                "risk_level": assessment.get("level"),
-                "next_steps": assessment.get("recommendation")
-            },
-            "disclaimer": "This is a decision support tool. All findings require physician validation. Not for diagnostic use."
-        }
-        
-        return response_data
-        
-    except Exception as e:
-        logger.error(f"ERROR in analyze_patient: {str(e)}")
-        traceback.print_exc()
-        raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
+            triaged.append(e)
+    
+    # All records come from one caller, so the AI summaries they need can
+    # share batched prompts: one batch call for the whole request
+    wanted = [
+        i for i, alerts in enumerate(triaged)
+        if not isinstance(alerts, Exception) and not _skips_summary(alerts)
+    ]
+    positions = {i: n for n, i in enumerate(wanted)}
+    batch = None
+    if wanted:
+        batch = asyncio.ensure_future(get_gemini_summaries_batch([records[i] for i in wanted]))
+    
+    async def summary_for(i: int):
+        return (await batch)[positions[i]]
+    
+    semaphore = asyncio.Semaphore(ANALYZE_BATCH_CONCURRENCY)
+    
+    async def analyze_one(i: int) -> dict:
+        if isinstance(triaged[i], Exception):
+            raise triaged[i]
+        async with semaphore:
+            summary = summary_for(i) if i in positions else None
+            return await _analyze_record(records[i], triaged[i], summary)
+    
+    results = await asyncio.gather(*(analyze_one(i) for i in range(len(records))), return_exceptions=True)
+    for i, result in enumerate(results):
+        if isinstance(result, Exception):
+            logger.error(f"Batch analysis failed for record {i}: {str(result)}")
+            results[i] = {"patient_id": records[i].get("patient_id"), "error": str(result)}
+    return results
+
+
+# Answer critical patients without waiting for the AI summary (EARLY_EXIT_ON_CRITICAL=0 disables)
+EARLY_EXIT_ON_CRITICAL = os.getenv("EARLY_EXIT_ON_CRITICAL", "1") == "1"
+
+# Stands in for the AI summary when it is skipped for a critical patient
+_CRITICAL_SUMMARY = {
+    "clinical_narrative": "Critical safety alert - AI summary skipped so the alert is not delayed",
+    "urgency_score": 10,
+    "priority_level": "High"
+}
+
+async def _run_cpu(func, *args):
+    """Run CPU-bound scoring in the process pool if configured, else a worker thread"""
+    if _process_pool is not None:
+        return await asyncio.get_running_loop().run_in_executor(_process_pool, func, *args)
+    return await asyncio.to_thread(func, *args)
+
+def _has_critical(*alert_lists) -> bool:
+    return any(alert["severity"] == "CRITICAL" for alerts in alert_lists for alert in alerts)
+
+def _triage(record: dict):
+    """Safety checks (vitals, labs, medications in one pass) for one record"""
+    return triage_pass(
+        record.get('vitals') or _EMPTY_DICT,
+        record.get('lab_results') or _EMPTY_LIST,
+        record.get('current_medications') or _EMPTY_LIST
+    )
+
+def _skips_summary(alerts) -> bool:
+    """True if the AI summary is skipped for these triage alerts (critical patient)"""
+    vital_alerts, lab_alerts, _ = alerts
+    return EARLY_EXIT_ON_CRITICAL and _has_critical(vital_alerts, lab_alerts)
+
+async def _analyze_record(record: dict, alerts=None, summary=None) -> dict:
+    """
+    Rules assessment, safety checks and AI summary for one patient record.
+    alerts and summary let /analyze-patients pass in the triage result and
+    an awaitable for this record's batched AI summary.
+    """
+    # Step 1: Safety Checks. They take microseconds, so run them first and inline
+    if alerts is None:
+        alerts = _triage(record)
+    vital_alerts, lab_alerts, drug_alerts = alerts
+    
+    if _skips_summary(alerts):
+        # Step 2: Clinical Risk Assessment only; the AI round trip is skipped
+        risk_assessment = await _run_cpu(ClinicalDecisionSupport.generate_assessment, record)
+        ai_summary = dict(_CRITICAL_SUMMARY)
+    else:
+        # Steps 2-3 are independent: the rules assessment runs in a worker
+        # thread while the AI summary request is in flight
+        risk_assessment, ai_summary = await asyncio.gather(
+            # Step 2: Clinical Risk Assessment (Dataset-Free)
+            _run_cpu(ClinicalDecisionSupport.generate_assessment, record),
+            # Step 3: AI Reasoning (Explanation & Interpretation). Single
+            # records get their own request: records from different users
+            # are never combined into one prompt
+            summary if summary is not None else get_gemini_summary(record),
+            return_exceptions=True
+        )
+        # The rules assessment is required; only the AI summary may fail
+        if isinstance(risk_assessment, Exception):
+            raise risk_assessment
+    
+    if not risk_assessment.get("success"):
+        raise Exception(f"Risk assessment failed: {risk_assessment.get('error')}")
+    
+    assessment = risk_assessment["assessment"]
+    
+    if isinstance(ai_summary, Exception):
+        logger.warning(f"AI summary generation failed: {str(ai_summary)}")
+        summary_dict = {"clinical_narrative": "AI summary unavailable"}
+    else:
+        summary_dict = ai_summary.model_dump() if isinstance(ai_summary, BaseModel) else ai_summary
+    
+    # Step 4: Compile Response
+    return _compile_analysis_response(assessment, vital_alerts, lab_alerts, drug_alerts, summary_dict)
 
 
-@app.post("/clinical-assessment")
-async def clinical_assessment(patient_data: dict):
+@app.post("/clinical-assessment", openapi_extra=_JSON_OBJECT_BODY)
+async def clinical_assessment(request: Request):
     """
     Dedicated endpoint for clinical risk assessment.
     Dataset-free, real-time evaluation using clinical rules.
@@ -221,53 +452,23 @@ async def clinical_assessment(patient_data: dict):
         "allergies": []
     }
     """
-    try:
-        result = ClinicalDecisionSupport.generate_assessment(patient_data)
-        return result
-    except Exception as e:
-        logger.error(f"Clinical assessment failed: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Assessment failed: {str(e)}")
-    
-# Add this endpoint after the @app.post("/patients") endpoint in main.py
-
-@app.delete("/patients/{patient_id}")
-async def delete_patient(patient_id: str):
-    """Delete a patient from the database"""
-    try:
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        patients_path = os.path.join(current_dir, "..", "data", "patients.json")
-        
-        # Read current patients
-        with open(patients_path, "r") as f:
-            patients = json.load(f)
-        
-        # Find and remove the patient
-        original_count = len(patients)
-        patients = [p for p in patients if p.get("patient_id") != patient_id]
-        
-        if len(patients) == original_count:
-            raise HTTPException(status_code=404, detail=f"Patient {patient_id} not found")
-        
-        # Save updated list
-        with open(patients_path, "w") as f:
-            json.dump(patients, f, indent=2)
-        
-        return {
-            "status": "success", 
-            "message": f"Patient {patient_id} deleted successfully",
-            "deleted_count": original_count - len(patients)
-        }
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    patient_data = await _json_body(request)
+    result = ClinicalDecisionSupport.generate_assessment(patient_data)
+    return result
 
 
 # ============================================================================
 # EMERGENCY ALERT ENDPOINTS - HACKATHON WINNING FEATURES
 # ============================================================================
 
+# Vitals used for any reading not supplied to /emergency-alert
+_DEFAULT_VITALS = VitalSigns(
+    heart_rate=80,
+    blood_pressure="120/80",
+    oxygen_level=98,
+    temperature=37.0
+)
+
 @app.post("/emergency-alert")
 async def create_emergency_alert(
     patient_id: str,
@@ -289,32 +490,31 @@ async def create_emergency_alert(
     - INFO: Blue - monitor and observe
     - NORMAL: Green - all okay
     """
-    try:
-        # Build vitals if provided
-        vitals = None
-        if any([heart_rate, blood_pressure, oxygen_level, temperature]):
-            vitals = VitalSigns(
-                heart_rate=heart_rate or 80,
-                blood_pressure=blood_pressure or "120/80",
-                oxygen_level=oxygen_level or 98,
-                temperature=temperature or 37.0
-            )
-        
-        alert = EmergencyAlert(
-            patient_id=patient_id,
-            patient_name=patient_name,
-            alert_level=alert_level,
-            message=message,
-            vitals=vitals,
-            risk_score=risk_score
-        )
-        
-        result = await create_alert(alert)
-        return result
-        
-    except Exception as e:
-        logger.error(f"Emergency alert creation failed: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
+    # Build vitals if provided; missing readings keep the defaults
+    vitals = None
+    overrides = {
+        name: value for name, value in (
+            ("heart_rate", heart_rate),
+            ("blood_pressure", blood_pressure),
+            ("oxygen_level", oxygen_level),
+            ("temperature", temperature)
+        ) if value
+    }
+    if overrides:
+        vitals = _DEFAULT_VITALS.model_copy(update=overrides)
+    
+    # Parameters were already validated by FastAPI; skip re-validation
+    alert = EmergencyAlert.model_construct(
+        patient_id=patient_id,
+        patient_name=patient_name,
+        alert_level=alert_level,
+        message=message,
+        vitals=vitals,
+        risk_score=risk_score
+    )
+    
+    result = await create_alert(alert)
+    return result
 
 
 @app.get("/alerts/{patient_id}")
@@ -323,11 +523,7 @@ async def get_patient_alerts_endpoint(patient_id: str):
     Get all alerts for a specific patient
     Returns: critical, warning, and info alerts
     """
-    try:
-        return get_patient_alerts(patient_id)
-    except Exception as e:
-        logger.error(f"Failed to retrieve alerts: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
+    return get_patient_alerts(patient_id)
 
 
 @app.get("/alerts/active/all")
@@ -336,30 +532,21 @@ async def get_all_active_alerts():
     Get all currently active alerts across all patients
     Useful for doctor dashboard and monitoring
     """
-    try:
-        return {
-            "active_alerts": get_active_alerts(),
-            "total_active": len(get_active_alerts()),
-            "critical_count": len([a for a in get_active_alerts() if a["alert_level"] == "CRITICAL"])
-        }
-    except Exception as e:
-        logger.error(f"Failed to retrieve active alerts: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
+    alerts = get_active_alerts()  # one snapshot for the list and both counts
+    return {
+        "active_alerts": alerts,
+        "total_active": len(alerts),
+        "critical_count": sum(1 for a in alerts if a["alert_level"] == "CRITICAL")
+    }
 
 
 @app.post("/alerts/{alert_id}/resolve")
 async def resolve_alert_endpoint(alert_id: str):
     """Mark an alert as resolved"""
-    try:
-        success = resolve_alert(alert_id)
-        if not success:
-            raise HTTPException(status_code=404, detail="Alert not found")
-        return {"status": "alert_resolved", "alert_id": alert_id}
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"Failed to resolve alert: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
+    success = resolve_alert(alert_id)
+    if not success:
+        raise HTTPException(status_code=404, detail="Alert not found")
+    return {"status": "alert_resolved", "alert_id": alert_id}
 
 
 @app.post("/emergency-sos")
@@ -368,36 +555,35 @@ async def emergency_sos_button(patient_id: str, patient_name: str):
     Emergency SOS Button - Highest priority alert
     Immediately notifies all contacts
     """
-    try:
-        alert = EmergencyAlert(
-            patient_id=patient_id,
-            patient_name=patient_name,
-            alert_level=AlertLevel.CRITICAL,
-            message=f"🆘 EMERGENCY SOS ACTIVATED by patient {patient_name}",
-            risk_score=100  # Maximum risk
-        )
-        
-        result = await create_alert(alert)
-        result["message"] = "EMERGENCY SERVICES NOTIFIED"
-        return result
-        
-    except Exception as e:
-        logger.error(f"SOS activation failed: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
+    alert = EmergencyAlert.model_construct(
+        patient_id=patient_id,
+        patient_name=patient_name,
+        alert_level=AlertLevel.CRITICAL,
+        message=f"🆘 EMERGENCY SOS ACTIVATED by patient {patient_name}",
+        risk_score=100  # Maximum risk
+    )
+    
+    result = await create_alert(alert)
+    result["message"] = "EMERGENCY SERVICES NOTIFIED"
+    return result
 
 
 # ============================================================================
 # HACKATHON DEMO ENDPOINTS - Pre-configured test scenarios
 # ============================================================================
 
+# Static payload, so its body and ETag are computed once
+_DEMO_PATIENTS_BYTES = orjson.dumps({
+    "patients": DEMO_PATIENTS,
+    "total": len(DEMO_PATIENTS),
+    "message": "Demo patients for hackathon testing"
+})
+_DEMO_PATIENTS_ETAG = '"' + hashlib.blake2b(_DEMO_PATIENTS_BYTES, digest_size=8).hexdigest() + '"'
+
 @app.get("/demo/patients")
-async def get_demo_patients_endpoint():
+async def get_demo_patients_endpoint(request: Request):
     """Get all demo patients for testing"""
-    return {
-        "patients": DEMO_PATIENTS,
-        "total": len(DEMO_PATIENTS),
-        "message": "Demo patients for hackathon testing"
-    }
+    return _cached_json(request, _DEMO_PATIENTS_ETAG, _DEMO_PATIENTS_BYTES)
 
 
 @app.get("/demo/patient/{patient_id}")
@@ -418,30 +604,53 @@ async def get_demo_alerts_endpoint(patient_id: str):
     return alerts
 
 
+# Scenario name -> (demo patient, alert level); fixed, so the demo alerts
+# are built once here and only copied per request
+_DEMO_SCENARIOS = {
+    "critical": (DEMO_PATIENTS[0], AlertLevel.CRITICAL),
+    "warning": (DEMO_PATIENTS[1], AlertLevel.WARNING),
+    "normal": (DEMO_PATIENTS[2], AlertLevel.NORMAL),
+    "emergency": (DEMO_PATIENTS[3], AlertLevel.CRITICAL)
+}
+
+_PREBUILT_DEMO_ALERTS = {
+    scenario_name: EmergencyAlert.model_construct(
+        patient_id=patient["patient_id"],
+        patient_name=patient["name"],
+        alert_level=alert_level,
+        message=f"Demo {scenario_name.upper()} alert - {patient['symptoms']}",
+        risk_score=patient["risk_score"],
+        vitals=VitalSigns.model_construct(
+            heart_rate=patient["heart_rate"],
+            blood_pressure=patient["blood_pressure"],
+            oxygen_level=patient["oxygen_level"],
+            temperature=patient["temperature"],
+            respiratory_rate=patient["respiratory_rate"]
+        )
+    )
+    for scenario_name, (patient, alert_level) in _DEMO_SCENARIOS.items()
+}
+
+_DEMO_SCENARIO_BYTES = {
+    scenario_name: orjson.dumps({
+        "patient": patient,
+        "alerts": get_demo_alerts(patient["patient_id"]),
+        "scenario": scenario_name
+    })
+    for scenario_name, (patient, _) in _DEMO_SCENARIOS.items()
+}
+
+
 @app.get("/demo/scenario/{scenario_name}")
 async def get_demo_scenario(scenario_name: str):
     """
     Get a specific demo scenario
     Available scenarios: critical, warning, normal, emergency
     """
-    scenarios = {
-        "critical": DEMO_PATIENTS[0],
-        "warning": DEMO_PATIENTS[1],
-        "normal": DEMO_PATIENTS[2],
-        "emergency": DEMO_PATIENTS[3]
-    }
-    
-    if scenario_name not in scenarios:
+    payload = _DEMO_SCENARIO_BYTES.get(scenario_name)
+    if payload is None:
         raise HTTPException(status_code=404, detail=f"Scenario '{scenario_name}' not found")
-    
-    patient = scenarios[scenario_name]
-    alerts = get_demo_alerts(patient["patient_id"])
-    
-    return {
-        "patient": patient,
-        "alerts": alerts,
-        "scenario": scenario_name
-    }
+    return Response(payload, media_type="application/json")
 
 
 @app.post("/demo/trigger-alert/{scenario_name}")
@@ -450,42 +659,12 @@ async def trigger_demo_alert(scenario_name: str):
     Trigger an alert for a demo scenario
     Useful for testing the emergency alert system
     """
-    scenarios = {
-        "critical": DEMO_PATIENTS[0],
-        "warning": DEMO_PATIENTS[1],
-        "normal": DEMO_PATIENTS[2],
-        "emergency": DEMO_PATIENTS[3]
-    }
-    
-    if scenario_name not in scenarios:
+    alert = _PREBUILT_DEMO_ALERTS.get(scenario_name)
+    if alert is None:
         raise HTTPException(status_code=404, detail=f"Scenario '{scenario_name}' not found")
     
-    patient = scenarios[scenario_name]
-    
-    # Map scenario to alert level
-    alert_levels = {
-        "critical": AlertLevel.CRITICAL,
-        "warning": AlertLevel.WARNING,
-        "normal": AlertLevel.NORMAL,
-        "emergency": AlertLevel.CRITICAL
-    }
-    
-    alert = EmergencyAlert(
-        patient_id=patient["patient_id"],
-        patient_name=patient["name"],
-        alert_level=alert_levels[scenario_name],
-        message=f"Demo {scenario_name.upper()} alert - {patient['symptoms']}",
-        risk_score=patient["risk_score"],
-        vitals=VitalSigns(
-            heart_rate=patient["heart_rate"],
-            blood_pressure=patient["blood_pressure"],
-            oxygen_level=patient["oxygen_level"],
-            temperature=patient["temperature"],
-            respiratory_rate=patient["respiratory_rate"]
-        )
-    )
-    
-    result = await create_alert(alert)
+    # Each trigger is a new alert: fresh copy with the current time
+    result = await create_alert(alert.model_copy(update={"created_at": datetime.now()}))
     return {
         "status": "demo_alert_triggered",
         "scenario": scenario_name,
@@ -493,45 +672,58 @@ async def trigger_demo_alert(scenario_name: str):
     }
 
 
+_QUICKSTART_BYTES = orjson.dumps({
+    "title": "MedAssist - Hackathon Demo Quick Start",
+    "endpoints": {
+        "demo_patients": "/demo/patients",
+        "demo_alerts": "/demo/alerts/{patient_id}",
+        "demo_scenario": "/demo/scenario/{scenario_name}",
+        "trigger_alert": "/demo/trigger-alert/{scenario_name}",
+        "emergency_sos": "/emergency-sos"
+    },
+    "scenarios": ["critical", "warning", "normal", "emergency"],
+    "example_demo_patients": {
+        "critical": "demo_critical_001",
+        "warning": "demo_warning_002",
+        "normal": "demo_normal_003",
+        "emergency": "demo_crisis_004"
+    },
+    "getting_started": [
+        "1. GET /demo/patients - See all demo patients",
+        "2. GET /demo/scenario/critical - Get critical scenario with alerts",
+        "3. POST /demo/trigger-alert/emergency - Trigger emergency alert",
+        "4. POST /emergency-sos - Activate emergency SOS"
+    ],
+    "frontend_setup": {
+        "import": "import EmergencyDashboard from './components/EmergencyDashboard'",
+        "usage": "<EmergencyDashboard patient={demoPatient} />",
+        "components": ["EmergencyDashboard", "RiskGauge", "VitalSignsDisplay"]
+    }
+})
+
 @app.get("/demo/quick-start")
 async def demo_quick_start():
     """
     Quick start guide for hackathon demo
     Shows how to access all demo features
     """
-    return {
-        "title": "MedAssist - Hackathon Demo Quick Start",
-        "endpoints": {
-            "demo_patients": "/demo/patients",
-            "demo_alerts": "/demo/alerts/{patient_id}",
-            "demo_scenario": "/demo/scenario/{scenario_name}",
-            "trigger_alert": "/demo/trigger-alert/{scenario_name}",
-            "emergency_sos": "/emergency-sos"
-        },
-        "scenarios": ["critical", "warning", "normal", "emergency"],
-        "example_demo_patients": {
-            "critical": "demo_critical_001",
-            "warning": "demo_warning_002",
-            "normal": "demo_normal_003",
-            "emergency": "demo_crisis_004"
-        },
-        "getting_started": [
-            "1. GET /demo/patients - See all demo patients",
-            "2. GET /demo/scenario/critical - Get critical scenario with alerts",
-            "3. POST /demo/trigger-alert/emergency - Trigger emergency alert",
-            "4. POST /emergency-sos - Activate emergency SOS"
-        ],
-        "frontend_setup": {
-            "import": "import EmergencyDashboard from './components/EmergencyDashboard'",
-            "usage": "<EmergencyDashboard patient={demoPatient} />",
-            "components": ["EmergencyDashboard", "RiskGauge", "VitalSignsDisplay"]
-        }
-    }
+    return Response(_QUICKSTART_BYTES, media_type="application/json")
 
     
 if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv("PORT", 8000))
-    uvicorn.run(app, host="127.0.0.1", port=port, reload=True)
+    # loop/http "auto" pick uvloop and httptools, which uvicorn[standard]
+    # installs on Linux/macOS. Alerts and patients are held in process
+    # memory, so keep WORKERS=1 unless that state moves out of process.
+    uvicorn.run(
+        "main:app",
+        host="127.0.0.1",
+        port=port,
+        loop="auto",
+        http="auto",
+        reload=os.getenv("DEV_RELOAD") == "1",
+        workers=int(os.getenv("WORKERS", "1"))
+    )
     
     
\ No newline at end of file
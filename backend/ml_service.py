@@ -3,45 +3,34 @@ ML Service - Simple Risk Scoring
 For physician review only
 """
 
+from functools import lru_cache
+
+
+@lru_cache(maxsize=4096)
+def _predict_priority(age: int, systolic: int, hr: int, hba1c: float) -> int:
+    """Priority for one set of inputs, cached on the exact values"""
+    # Each factor adds 0, 1 or 2 points; tiers nest, so summing the
+    # comparisons gives the tier without a branch per threshold
+    score = (
+        (age > 75) + (age > 60)                      # Age factor
+        + (systolic > 160) + (systolic > 140)        # Blood pressure factor
+        + (hr > 100 or hr < 60)                      # Heart rate factor
+        + (hba1c > 9.0) + (hba1c > 7.0)              # HbA1c factor (diabetes control)
+    )
+
+    # 0 = Low (<2 points), 1 = Moderate (2-3), 2 = High (4+)
+    return (score >= 4) + (score >= 2)
+
+
 class MLService:
     """Simple ML-based risk scoring"""
-    
+
     def predict_priority(self, age: int, systolic: int, hr: int, hba1c: float) -> int:
         """
         Predict patient priority score (0=Low, 1=Moderate, 2=High)
         Based on simple rule-based scoring
         """
-        score = 0
-        
-        # Age factor
-        if age > 75:
-            score += 2
-        elif age > 60:
-            score += 1
-        
-        # Blood pressure factor
-        if systolic > 160:
-            score += 2
-        elif systolic > 140:
-            score += 1
-        
-        # Heart rate factor
-        if hr > 100 or hr < 60:
-            score += 1
-        
-        # HbA1c factor (diabetes control)
-        if hba1c > 9.0:
-            score += 2
-        elif hba1c > 7.0:
-            score += 1
-        
-        # Convert score to priority level
-        if score >= 4:
-            return 2  # High priority
-        elif score >= 2:
-            return 1  # Moderate priority
-        else:
-            return 0  # Low priority
+        return _predict_priority(age, systolic, hr, hba1c)
 
 # Create singleton instance
-ml_service = MLService()
\ No newline at end of file
+ml_service = MLService()
@@ -0,0 +1,416 @@
+"""
+Patient Store - patients.json kept in memory with an append-only change journal
+Adds and deletes append one small line to patients.journal; the full JSON
+file is rewritten only when the journal is compacted. Worker processes
+share both files: appends, reloads and compactions hold an exclusive lock on
+patients.lock, and compaction re-reads patients.json and the journal first,
+so changes journaled by other workers are folded in rather than overwritten.
+
+With REDIS_URL set, workers also see each other's writes before the next
+compaction: every write bumps a version counter in Redis, and a worker that
+sees a new version loads the list cached under that version (or rebuilds it
+from disk and caches it). The files on disk stay the source of truth.
+
+With PATIENT_STORE=sqlite, patients live in data/patients.db instead (one row
+per patient, WAL mode), seeded from patients.json on first use.
+"""
+
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import uuid
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Optional, Tuple
+
+import orjson
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
+
+PATIENTS_PATH = Path(__file__).resolve().parent.parent / "data" / "patients.json"
+JOURNAL_PATH = PATIENTS_PATH.with_suffix(".journal")
+LOCK_PATH = PATIENTS_PATH.with_suffix(".lock")
+
+COMPACT_INTERVAL = 5          # seconds between background compactions
+COMPACT_MAX_OPS = 100         # compact early after this many journaled changes
+COMPACT_JOURNAL_RATIO = 0.5   # ...or once the journal reaches this share of patients.json
+
+# "json" (patients.json + journal) or "sqlite" (patients.db)
+PATIENT_STORE = os.getenv("PATIENT_STORE", "json")
+PATIENTS_DB = PATIENTS_PATH.with_suffix(".db")
+
+# Optional cross-worker cache (needs the redis package)
+REDIS_URL = os.getenv("REDIS_URL")
+REDIS_PATIENTS_KEY = "patients:v1"
+REDIS_CACHE_TTL = 60          # seconds a cached version of the list is kept
+
+if REDIS_URL:
+    import redis.asyncio as redis
+    _redis = redis.from_url(REDIS_URL)
+else:
+    _redis = None
+
+# In-memory state: patients.json with the journal replayed on top
+_patients: list = []
+_patients_by_id: dict = {}        # patient_id -> index in _patients
+_base_mtime_ns: Optional[int] = None
+_base_size = 0
+_journal_ops = 0
+_journal_bytes = 0
+_generation = 0                   # bumped on every reload and applied change
+_redis_version: Optional[bytes] = None  # shared version the in-memory list reflects
+_serialized: Tuple[Optional[str], bytes] = (None, b"")  # (version, list as JSON)
+_lock = asyncio.Lock()
+
+
+def _lock_file():
+    f = open(LOCK_PATH, "a+b")
+    try:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+    except BaseException:
+        f.close()
+        raise
+    return f
+
+
+def _unlock_file(f):
+    try:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_UN)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+    finally:
+        f.close()
+
+
+@asynccontextmanager
+async def _disk_lock():
+    """Exclusive cross-process lock over patients.json and the journal"""
+    f = await asyncio.to_thread(_lock_file)
+    try:
+        yield
+    finally:
+        _unlock_file(f)
+
+
+def _read_bytes(path: Path) -> bytes:
+    try:
+        return path.read_bytes()
+    except FileNotFoundError:
+        return b""
+
+
+def _append_journal(line: bytes):
+    with open(JOURNAL_PATH, "ab") as f:
+        f.write(line)
+
+
+def _write_patients(data: bytes):
+    """Atomically replace patients.json"""
+    tmp_path = PATIENTS_PATH.with_suffix(".json.tmp")
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, PATIENTS_PATH)
+
+
+def _reindex_from(start: int):
+    for i in range(start, len(_patients)):
+        patient_id = _patients[i].get("patient_id")
+        if patient_id is not None:
+            _patients_by_id[patient_id] = i
+
+
+def _apply(op: dict) -> bool:
+    """Apply one journal operation; replaying an already-applied one is a no-op"""
+    global _generation
+    _generation += 1
+    if op["op"] == "add":
+        patient = op["patient"]
+        patient_id = patient.get("patient_id")
+        # Without an id a replayed add could not be recognized as a repeat
+        if patient_id is None or patient_id in _patients_by_id:
+            return False
+        _patients.append(patient)
+        _reindex_from(len(_patients) - 1)
+        return True
+    if op["op"] == "del":
+        idx = _patients_by_id.pop(op["id"], None)
+        if idx is None:
+            return False
+        del _patients[idx]
+        _reindex_from(idx)
+        return True
+    raise ValueError(f"Unknown journal operation: {op['op']}")
+
+
+def _replace_all(patients: list):
+    global _generation
+    _generation += 1
+    _patients[:] = patients
+    _patients_by_id.clear()
+    _reindex_from(0)
+
+
+async def _reload():
+    """Rebuild the in-memory list from patients.json plus any pending journal"""
+    async with _disk_lock():
+        await _reload_locked()
+
+
+async def _reload_locked():
+    """_reload for a caller already holding _disk_lock"""
+    global _base_mtime_ns, _base_size, _journal_ops, _journal_bytes
+    st = await asyncio.to_thread(os.stat, PATIENTS_PATH)
+    patients = orjson.loads(await asyncio.to_thread(PATIENTS_PATH.read_bytes))
+    _replace_all(patients)
+
+    journal = await asyncio.to_thread(_read_bytes, JOURNAL_PATH)
+    ops = []
+    for line in journal.splitlines():
+        try:
+            ops.append(orjson.loads(line))
+        except orjson.JSONDecodeError:
+            # Torn final line from an interrupted append
+            logger.warning("Skipping unreadable patient journal entry")
+    for op in ops:
+        _apply(op)
+
+    _base_mtime_ns, _base_size = st.st_mtime_ns, st.st_size
+    _journal_ops, _journal_bytes = len(ops), len(journal)
+
+
+async def _refresh():
+    """Reload if patients.json changed on disk (raises FileNotFoundError if missing)"""
+    st = await asyncio.to_thread(os.stat, PATIENTS_PATH)
+    if st.st_mtime_ns != _base_mtime_ns:
+        async with _lock:
+            if st.st_mtime_ns != _base_mtime_ns:
+                await _reload()
+    if _redis is not None:
+        await _sync_redis()
+
+
+async def _sync_redis():
+    """Pick up writes other workers announced by bumping the Redis version"""
+    global _redis_version
+    version = await _redis.get(f"{REDIS_PATIENTS_KEY}:version")
+    if version == _redis_version:
+        return
+    async with _lock:
+        key = f"{REDIS_PATIENTS_KEY}:{(version or b'0').decode()}"
+        blob = await _redis.get(key)
+        if blob is not None:
+            _replace_all(orjson.loads(blob))
+        else:
+            # Writers journal before bumping the version, so disk is at
+            # least as new as this version
+            await _reload()
+            await _redis.set(key, orjson.dumps(_patients), ex=REDIS_CACHE_TTL)
+        _redis_version = version
+
+
+async def _record(op: dict):
+    """Journal one operation, apply it in memory, and compact if the journal has grown enough"""
+    global _journal_ops, _journal_bytes
+    line = orjson.dumps(op) + b"\n"
+    async with _disk_lock():
+        await asyncio.to_thread(_append_journal, line)
+    _apply(op)
+    _journal_ops += 1
+    _journal_bytes += len(line)
+    if _redis is not None:
+        await _redis.incr(f"{REDIS_PATIENTS_KEY}:version")
+    if _journal_ops >= COMPACT_MAX_OPS or _journal_bytes >= _base_size * COMPACT_JOURNAL_RATIO:
+        await _compact_locked()
+
+
+async def _compact_locked():
+    """Fold the journal into patients.json and drop it (caller holds _lock)"""
+    global _base_mtime_ns, _base_size, _journal_ops, _journal_bytes, _redis_version
+    async with _disk_lock():
+        if not await asyncio.to_thread(JOURNAL_PATH.exists):
+            return
+        # Writers bump the Redis version only after journaling, so the disk
+        # state read below includes every write up to this version
+        version = await _redis.get(f"{REDIS_PATIENTS_KEY}:version") if _redis is not None else None
+        # Other workers append to the same journal (and may have compacted
+        # since this worker last looked), so rebuild from disk, not memory
+        # (or from a possibly stale Redis copy)
+        await _reload_locked()
+        _redis_version = version
+        await asyncio.to_thread(_write_patients, orjson.dumps(_patients, option=orjson.OPT_INDENT_2))
+        st = await asyncio.to_thread(os.stat, PATIENTS_PATH)
+        _base_mtime_ns, _base_size = st.st_mtime_ns, st.st_size
+        # A crash before this unlink only means the journal is replayed again,
+        # which _apply treats as a no-op (every journaled add has an id)
+        await asyncio.to_thread(JOURNAL_PATH.unlink, missing_ok=True)
+        _journal_ops = _journal_bytes = 0
+
+
+# --- SQLite backend (PATIENT_STORE=sqlite) ---------------------------------
+
+_DB_SCHEMA = """
+CREATE TABLE IF NOT EXISTS patients (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    patient_id TEXT UNIQUE,
+    data BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS patients_meta (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    version INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO patients_meta VALUES (1, 0);
+"""
+
+_db = None
+_db_lock = threading.Lock()  # one connection shared by all worker threads
+_db_cache: Tuple[Optional[int], list] = (None, [])  # (version, patients)
+
+
+def _db_connect() -> sqlite3.Connection:
+    """Open patients.db once, creating it (and importing patients.json) if needed"""
+    global _db
+    if _db is None:
+        conn = sqlite3.connect(PATIENTS_DB, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(_DB_SCHEMA)
+        _db_import_json(conn)
+        _db = conn
+    return _db
+
+
+def _db_import_json(conn: sqlite3.Connection):
+    """Copy patients.json into an empty table"""
+    if not PATIENTS_PATH.exists():
+        return
+    if conn.execute("SELECT 1 FROM patients LIMIT 1").fetchone():
+        return
+    patients = orjson.loads(PATIENTS_PATH.read_bytes())
+    with conn:
+        conn.executemany(
+            "INSERT OR IGNORE INTO patients (patient_id, data) VALUES (?, ?)",
+            [(p.get("patient_id"), orjson.dumps(p)) for p in patients]
+        )
+        conn.execute("UPDATE patients_meta SET version = version + 1")
+
+
+def _db_get_versioned() -> Tuple[int, list]:
+    global _db_cache
+    with _db_lock:
+        conn = _db_connect()
+        version = conn.execute("SELECT version FROM patients_meta").fetchone()[0]
+        if version != _db_cache[0]:
+            rows = conn.execute("SELECT data FROM patients ORDER BY seq").fetchall()
+            _db_cache = (version, [orjson.loads(data) for data, in rows])
+        return _db_cache
+
+
+def _db_add(patient: dict) -> bool:
+    with _db_lock:
+        conn = _db_connect()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT INTO patients (patient_id, data) VALUES (?, ?)",
+                    (patient.get("patient_id"), orjson.dumps(patient))
+                )
+                conn.execute("UPDATE patients_meta SET version = version + 1")
+        except sqlite3.IntegrityError:
+            return False
+    return True
+
+
+def _db_delete(patient_id: str) -> bool:
+    with _db_lock:
+        conn = _db_connect()
+        with conn:
+            deleted = conn.execute("DELETE FROM patients WHERE patient_id = ?", (patient_id,)).rowcount
+            if deleted:
+                conn.execute("UPDATE patients_meta SET version = version + 1")
+    return bool(deleted)
+
+
+# --- Public API --------------------------------------------------------------
+
+async def get_patients() -> list:
+    """All patients, in insertion order"""
+    return (await get_patients_versioned())[1]
+
+
+async def get_patients_versioned() -> Tuple[str, list]:
+    """All patients plus a version tag that changes whenever the list does"""
+    if PATIENT_STORE == "sqlite":
+        version, patients = await asyncio.to_thread(_db_get_versioned)
+        return f"db-{version}", patients
+    await _refresh()
+    return f"{_base_mtime_ns}-{_generation}", _patients
+
+
+async def get_patients_json() -> Tuple[str, bytes]:
+    """get_patients_versioned, with the list already serialized to JSON bytes
+    (serialized once per version)"""
+    global _serialized
+    version, patients = await get_patients_versioned()
+    if _serialized[0] != version:
+        _serialized = (version, orjson.dumps(patients))
+    return _serialized
+
+
+async def add_patient(patient: dict) -> bool:
+    """
+    Add a patient; returns False if its patient_id is already taken.
+    A patient without a patient_id is given a generated one.
+    """
+    if patient.get("patient_id") is None:
+        patient["patient_id"] = f"P-{uuid.uuid4().hex[:12]}"
+    if PATIENT_STORE == "sqlite":
+        return await asyncio.to_thread(_db_add, patient)
+    await _refresh()
+    async with _lock:
+        if patient["patient_id"] in _patients_by_id:
+            return False
+        await _record({"op": "add", "patient": patient})
+    return True
+
+
+async def delete_patient(patient_id: str) -> bool:
+    """Delete a patient by id; returns False if no such patient"""
+    if PATIENT_STORE == "sqlite":
+        return await asyncio.to_thread(_db_delete, patient_id)
+    await _refresh()
+    async with _lock:
+        if patient_id not in _patients_by_id:
+            return False
+        await _record({"op": "del", "id": patient_id})
+    return True
+
+
+async def compact():
+    """Fold any pending journal entries into patients.json"""
+    if PATIENT_STORE == "sqlite":
+        return  # SQLite checkpoints its own WAL
+    async with _lock:
+        await _compact_locked()
+
+
+async def compact_periodically():
+    """Background task: compact every COMPACT_INTERVAL seconds"""
+    while True:
+        await asyncio.sleep(COMPACT_INTERVAL)
+        try:
+            await compact()
+        except Exception as e:
+            logger.error(f"Patient journal compaction failed: {str(e)}")
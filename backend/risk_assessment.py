@@ -6,7 +6,13 @@ NO machine learning, NO data training required.
 
 from typing import Dict, List, Optional
 from dataclasses import dataclass
-from clinical_rules_engine import ClinicalRulesEngine, RiskLevel
+from functools import lru_cache
+from types import MappingProxyType
+from clinical_rules_engine import ClinicalRulesEngine, RiskLevel, normalize_strings, parse_vitals
+
+# Shared read-only defaults for missing patient fields
+_EMPTY_DICT = MappingProxyType({})
+_EMPTY_LIST = ()
 
 @dataclass
 class RiskAssessment:
@@ -55,24 +61,27 @@ class RiskScorer:
         age: int,
         gender: str,
         comorbidities: List[str],
-        lifestyle: Dict = {}
+        lifestyle: Optional[Dict] = None
     ) -> RiskAssessment:
         """
         Assess patient risk based on current state.
         Returns detailed risk assessment with explanations.
         """
         
-        # Step 1: Evaluate each domain
-        vitals_score, vitals_findings = ClinicalRulesEngine.evaluate_vitals_risk(vitals)
+        # Step 1: Evaluate each domain (vitals parsed and lists lowercased once)
+        parsed_vitals = parse_vitals(vitals)
+        symptoms = normalize_strings(symptoms)
+        comorbidities = normalize_strings(comorbidities)
+        vitals_score, vitals_findings = ClinicalRulesEngine.evaluate_vitals_risk(parsed_vitals)
         bmi_score, bmi_findings = ClinicalRulesEngine.evaluate_bmi_risk(vitals.get("bmi", 0))
         symptoms_score, symptom_findings = ClinicalRulesEngine.evaluate_symptoms_risk(symptoms)
         demo_score, demographic_findings = ClinicalRulesEngine.evaluate_demographics_risk(
             age, gender, comorbidities
         )
-        lifestyle_score, lifestyle_findings = ClinicalRulesEngine.evaluate_lifestyle_risk(lifestyle)
+        lifestyle_score, lifestyle_findings = ClinicalRulesEngine.evaluate_lifestyle_risk(lifestyle or _EMPTY_DICT)
         
         # Step 1.5: Critical Combinations
-        critical_alerts = ClinicalRulesEngine.evaluate_critical_combinations(vitals, symptoms)
+        critical_alerts = ClinicalRulesEngine.evaluate_critical_combinations(parsed_vitals, symptoms)
         vitals_findings = critical_alerts + vitals_findings
 
         # Step 2: Calculate total score
@@ -150,6 +159,37 @@ class RiskScorer:
         
         return " ".join(explanation_parts)
 
+ASSESSMENT_CACHE_SIZE = 4096  # distinct patient inputs whose assessment is memoized
+
+
+def _assessment_key(vitals, symptoms, age, gender, comorbidities, lifestyle) -> Optional[tuple]:
+    """Hashable form of the assessment inputs, or None if they cannot be cached"""
+    if not isinstance(symptoms, (list, tuple)) or not isinstance(comorbidities, (list, tuple)):
+        return None
+    try:
+        key = (
+            tuple(sorted(vitals.items())), tuple(symptoms), age, gender,
+            tuple(comorbidities), tuple(sorted(lifestyle.items()))
+        )
+        hash(key)
+    except (AttributeError, TypeError):
+        return None
+    return key
+
+
+@lru_cache(maxsize=ASSESSMENT_CACHE_SIZE)
+def _assess_cached(key: tuple) -> RiskAssessment:
+    vitals, symptoms, age, gender, comorbidities, lifestyle = key
+    return RiskScorer.assess_patient(
+        vitals=dict(vitals),
+        symptoms=list(symptoms),
+        age=age,
+        gender=gender,
+        comorbidities=list(comorbidities),
+        lifestyle=dict(lifestyle)
+    )
+
+
 class ClinicalDecisionSupport:
     """
     Main entry point for clinical decision support.
@@ -174,22 +214,27 @@ class ClinicalDecisionSupport:
         """
         try:
             # Extract data
-            vitals = patient_data.get("vitals", {})
-            symptoms = patient_data.get("symptoms", [])
+            vitals = patient_data.get("vitals") or _EMPTY_DICT
+            symptoms = patient_data.get("symptoms") or _EMPTY_LIST
             age = patient_data.get("age", 50)
             gender = patient_data.get("gender", "Unknown")
-            comorbidities = patient_data.get("medical_history", [])
-            lifestyle = patient_data.get("lifestyle", {})
+            comorbidities = patient_data.get("medical_history") or _EMPTY_LIST
+            lifestyle = patient_data.get("lifestyle") or _EMPTY_DICT
             
-            # Assess risk
-            assessment = RiskScorer.assess_patient(
-                vitals=vitals,
-                symptoms=symptoms,
-                age=age,
-                gender=gender,
-                comorbidities=comorbidities,
-                lifestyle=lifestyle
-            )
+            # Assess risk; scoring is deterministic, so identical inputs reuse
+            # the earlier result (its findings lists are shared, treat as read-only)
+            key = _assessment_key(vitals, symptoms, age, gender, comorbidities, lifestyle)
+            if key is not None:
+                assessment = _assess_cached(key)
+            else:
+                assessment = RiskScorer.assess_patient(
+                    vitals=vitals,
+                    symptoms=symptoms,
+                    age=age,
+                    gender=gender,
+                    comorbidities=comorbidities,
+                    lifestyle=lifestyle
+                )
             
             return {
                 "success": True,
@@ -203,4 +248,3 @@ class ClinicalDecisionSupport:
                 "error": str(e),
                 "disclaimer": "Assessment failed. Please consult physician directly."
             }
-
@@ -20,7 +20,17 @@ try:
     
     print("\nStarting server...")
     print("=" * 50)
-    uvicorn.run(app, host="127.0.0.1", port=8000, reload=False)
+    # Same settings as `python main.py`: uvloop/httptools when installed,
+    # WORKERS processes (alerts live in process memory, so 1 by default)
+    uvicorn.run(
+        "main:app",
+        host="127.0.0.1",
+        port=int(os.getenv("PORT", 8000)),
+        loop="auto",
+        http="auto",
+        reload=os.getenv("DEV_RELOAD") == "1",
+        workers=int(os.getenv("WORKERS", "1"))
+    )
     
 except ImportError as e:
     print(f"✗ Import Error: {e}")
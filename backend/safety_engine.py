@@ -3,88 +3,91 @@ Safety Engine - Clinical Safety Checks
 For physician review only
 """
 
+import operator
+from collections import defaultdict
+from functools import lru_cache
+from typing import Tuple
+
+from clinical_rules_engine import parse_bp
+
+# (vitals key, parameter name, parser, report raw value?, bands). Each band is
+# (predicate on the parsed value, severity, message); the first match wins.
+VITAL_RULES = (
+    ("bp", "Blood Pressure", parse_bp, True, (
+        (lambda v: v[0] > 180 or v[1] > 120, "CRITICAL", "Hypertensive crisis - Immediate physician review required"),
+        (lambda v: v[0] < 90 or v[1] < 60, "HIGH", "Hypotension detected - Monitor closely")
+    )),
+    ("hr", "Heart Rate", int, False, (
+        (lambda v: v > 120, "HIGH", "Tachycardia - Evaluate for underlying cause"),
+        (lambda v: v < 50, "HIGH", "Bradycardia - Assess patient status")
+    )),
+    ("spo2", "SpO2", int, False, (
+        (lambda v: v < 90, "CRITICAL", "Severe hypoxemia - Immediate intervention required"),
+        (lambda v: v < 94, "HIGH", "Hypoxemia - Supplemental oxygen may be needed")
+    )),
+    ("temp", "Temperature", float, False, (
+        (lambda v: v > 38.5, "MEDIUM", "Fever detected - Evaluate for infection"),
+        (lambda v: v < 36.0, "MEDIUM", "Hypothermia - Assess patient condition")
+    ))
+)
+
+
 def check_vital_safety(vitals: dict) -> list:
     """Check vital signs for safety concerns"""
     alerts = []
     
-    # Blood Pressure
-    if "bp" in vitals:
-        bp = vitals["bp"]
-        try:
-            systolic, diastolic = map(int, bp.split('/'))
-            if systolic > 180 or diastolic > 120:
+    for key, parameter, parse, report_raw, bands in VITAL_RULES:
+        if key not in vitals:
+            continue
+        raw = vitals[key]
+        value = parse(raw)
+        if value is None:
+            continue
+        for predicate, severity, message in bands:
+            if predicate(value):
                 alerts.append({
-                    "severity": "CRITICAL",
-                    "parameter": "Blood Pressure",
-                    "value": bp,
-                    "message": "Hypertensive crisis - Immediate physician review required"
+                    "severity": severity,
+                    "parameter": parameter,
+                    "value": raw if report_raw else value,
+                    "message": message
                 })
-            elif systolic < 90 or diastolic < 60:
-                alerts.append({
-                    "severity": "HIGH",
-                    "parameter": "Blood Pressure",
-                    "value": bp,
-                    "message": "Hypotension detected - Monitor closely"
-                })
-        except:
-            pass
-    
-    # Heart Rate
-    if "hr" in vitals:
-        hr = int(vitals["hr"])
-        if hr > 120:
-            alerts.append({
-                "severity": "HIGH",
-                "parameter": "Heart Rate",
-                "value": hr,
-                "message": "Tachycardia - Evaluate for underlying cause"
-            })
-        elif hr < 50:
-            alerts.append({
-                "severity": "HIGH",
-                "parameter": "Heart Rate",
-                "value": hr,
-                "message": "Bradycardia - Assess patient status"
-            })
-    
-    # Oxygen Saturation
-    if "spo2" in vitals:
-        spo2 = int(vitals["spo2"])
-        if spo2 < 90:
-            alerts.append({
-                "severity": "CRITICAL",
-                "parameter": "SpO2",
-                "value": spo2,
-                "message": "Severe hypoxemia - Immediate intervention required"
-            })
-        elif spo2 < 94:
-            alerts.append({
-                "severity": "HIGH",
-                "parameter": "SpO2",
-                "value": spo2,
-                "message": "Hypoxemia - Supplemental oxygen may be needed"
-            })
-    
-    # Temperature
-    if "temp" in vitals:
-        temp = float(vitals["temp"])
-        if temp > 38.5:
-            alerts.append({
-                "severity": "MEDIUM",
-                "parameter": "Temperature",
-                "value": temp,
-                "message": "Fever detected - Evaluate for infection"
-            })
-        elif temp < 36.0:
-            alerts.append({
-                "severity": "MEDIUM",
-                "parameter": "Temperature",
-                "value": temp,
-                "message": "Hypothermia - Assess patient condition"
-            })
+                break
     
     return alerts
 
+# Lab rules keyed by the name fragment they match in a lowercased test name.
+# Each band is (compare, threshold, severity, message); the first band that
+# matches wins.
+LAB_RULES = {
+    "glucose": ("Glucose", (
+        (operator.gt, 400, "CRITICAL", "Severe hyperglycemia - Risk of DKA"),
+        (operator.lt, 70, "HIGH", "Hypoglycemia - Immediate treatment needed")
+    )),
+    "potassium": ("Potassium", (
+        (operator.gt, 6.0, "CRITICAL", "Severe hyperkalemia - Cardiac risk"),
+        (operator.lt, 3.0, "HIGH", "Severe hypokalemia - Arrhythmia risk")
+    )),
+    "creatinine": ("Creatinine", (
+        (operator.gt, 3.0, "HIGH", "Severe renal impairment - Adjust medications"),
+    ))
+}
+
+# Exact test names that stand for a LAB_RULES entry
+LAB_ALIASES = {"k": "potassium"}
+
+CRITICAL_LAB_STATUSES = frozenset({"CRITICAL", "PANIC"})
+
+
+@lru_cache(maxsize=256)
+def _lab_rules_for(test_name: str) -> tuple:
+    """LAB_RULES entries that apply to a lowercased test name (resolved once per name)"""
+    rules = [rule for key, rule in LAB_RULES.items() if key in test_name]
+    alias = LAB_ALIASES.get(test_name)
+    if alias is not None and LAB_RULES[alias] not in rules:
+        rules.append(LAB_RULES[alias])
+    return tuple(rules)
+
+
 def check_lab_safety(lab_results: list) -> list:
     """Check lab results for safety concerns"""
     alerts = []
@@ -92,10 +95,9 @@ def check_lab_safety(lab_results: list) -> list:
     for lab in lab_results:
         test_name = lab.get("test_name", "").lower()
         value = lab.get("value", 0)
-        status = lab.get("status", "").upper()
         
         # Critical lab values
-        if status in ["CRITICAL", "PANIC"]:
+        if lab.get("status", "").upper() in CRITICAL_LAB_STATUSES:
             alerts.append({
                 "severity": "CRITICAL",
                 "test": lab.get("test_name"),
@@ -104,91 +106,80 @@ def check_lab_safety(lab_results: list) -> list:
             })
         
         # Specific lab checks
-        if "glucose" in test_name:
-            if value > 400:
-                alerts.append({
-                    "severity": "CRITICAL",
-                    "test": "Glucose",
-                    "value": value,
-                    "message": "Severe hyperglycemia - Risk of DKA"
-                })
-            elif value < 70:
-                alerts.append({
-                    "severity": "HIGH",
-                    "test": "Glucose",
-                    "value": value,
-                    "message": "Hypoglycemia - Immediate treatment needed"
-                })
-        
-        if "potassium" in test_name or "k" == test_name:
-            if value > 6.0:
-                alerts.append({
-                    "severity": "CRITICAL",
-                    "test": "Potassium",
-                    "value": value,
-                    "message": "Severe hyperkalemia - Cardiac risk"
-                })
-            elif value < 3.0:
-                alerts.append({
-                    "severity": "HIGH",
-                    "test": "Potassium",
-                    "value": value,
-                    "message": "Severe hypokalemia - Arrhythmia risk"
-                })
-        
-        if "creatinine" in test_name:
-            if value > 3.0:
-                alerts.append({
-                    "severity": "HIGH",
-                    "test": "Creatinine",
-                    "value": value,
-                    "message": "Severe renal impairment - Adjust medications"
-                })
+        for display_name, bands in _lab_rules_for(test_name):
+            for compare, threshold, severity, message in bands:
+                if compare(value, threshold):
+                    alerts.append({
+                        "severity": severity,
+                        "test": display_name,
+                        "value": value,
+                        "message": message
+                    })
+                    break
     
     return alerts
 
+# Simple drug interaction database
+DRUG_INTERACTIONS = {
+    frozenset({"warfarin", "aspirin"}): {
+        "severity": "HIGH",
+        "message": "Increased bleeding risk - Monitor INR closely"
+    },
+    frozenset({"warfarin", "ibuprofen"}): {
+        "severity": "HIGH",
+        "message": "Increased bleeding risk - Consider alternative pain management"
+    },
+    frozenset({"lisinopril", "spironolactone"}): {
+        "severity": "HIGH",
+        "message": "Risk of hyperkalemia - Monitor potassium levels"
+    },
+    frozenset({"metformin", "contrast"}): {
+        "severity": "HIGH",
+        "message": "Risk of lactic acidosis - Hold metformin before contrast"
+    },
+    frozenset({"simvastatin", "clarithromycin"}): {
+        "severity": "CRITICAL",
+        "message": "Risk of rhabdomyolysis - Contraindicated combination"
+    }
+}
+
+# drug -> [(other drug, interaction)], so only real interactions are probed
+_INTERACTIONS_BY_DRUG = defaultdict(list)
+for _pair, _interaction in DRUG_INTERACTIONS.items():
+    _first, _second = _pair
+    _INTERACTIONS_BY_DRUG[_first].append((_second, _interaction))
+    _INTERACTIONS_BY_DRUG[_second].append((_first, _interaction))
+
+
 def check_drug_interactions(medications: list) -> list:
     """Check for drug interactions"""
     alerts = []
     
-    # Simple drug interaction database
-    interactions = {
-        ("warfarin", "aspirin"): {
-            "severity": "HIGH",
-            "message": "Increased bleeding risk - Monitor INR closely"
-        },
-        ("warfarin", "ibuprofen"): {
-            "severity": "HIGH",
-            "message": "Increased bleeding risk - Consider alternative pain management"
-        },
-        ("lisinopril", "spironolactone"): {
-            "severity": "HIGH",
-            "message": "Risk of hyperkalemia - Monitor potassium levels"
-        },
-        ("metformin", "contrast"): {
-            "severity": "HIGH",
-            "message": "Risk of lactic acidosis - Hold metformin before contrast"
-        },
-        ("simvastatin", "clarithromycin"): {
-            "severity": "CRITICAL",
-            "message": "Risk of rhabdomyolysis - Contraindicated combination"
-        }
-    }
-    
-    # Extract drug names
-    drug_names = [med.get("name", "").lower() for med in medications]
+    # Extract drug names (each listed drug checked once)
+    drug_names = list(dict.fromkeys(med.get("name", "").lower() for med in medications))
     
-    # Check for interactions
+    # Pair each drug only with known partners listed after it
+    position = {name: i for i, name in enumerate(drug_names)}
     for i, drug1 in enumerate(drug_names):
-        for drug2 in drug_names[i+1:]:
-            # Check both directions
-            interaction = interactions.get((drug1, drug2)) or interactions.get((drug2, drug1))
-            
-            if interaction:
-                alerts.append({
-                    "severity": interaction["severity"],
-                    "drugs": f"{drug1.title()} + {drug2.title()}",
-                    "message": interaction["message"]
-                })
+        partners = [
+            (position[drug2], drug2, interaction)
+            for drug2, interaction in _INTERACTIONS_BY_DRUG.get(drug1, ())
+            if position.get(drug2, -1) > i
+        ]
+        for _, drug2, interaction in sorted(partners, key=lambda p: p[0]):
+            alerts.append({
+                "severity": interaction["severity"],
+                "drugs": f"{drug1.title()} + {drug2.title()}",
+                "message": interaction["message"]
+            })
     
     return alerts
+
+
+def triage_pass(vitals: dict, lab_results: list, medications: list) -> Tuple[list, list, list]:
+    """Vital, lab and drug-interaction alerts for one record in a single call"""
+    return (
+        check_vital_safety(vitals),
+        check_lab_safety(lab_results),
+        check_drug_interactions(medications)
+    )
@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+"""
+Run the backend check scripts in one interpreter, so FastAPI, numpy and the
+clinical modules are imported once instead of once per script.
+
+    python test_all.py          # offline checks
+    python test_all.py --live   # also the HTTP checks (backend must be running)
+"""
+
+import os
+import runpy
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BACKEND_DIR)
+
+OFFLINE_SCRIPTS = ("test_backend.py", "test_clinical_system.py")
+LIVE_SCRIPTS = ("test_endpoint.py", "verify_clinical_logic.py")
+
+
+def run_script(name: str) -> bool:
+    """Run one script as __main__; False if it exits non-zero or raises"""
+    path = os.path.join(BACKEND_DIR, name)
+    sys.argv = [path]
+    try:
+        runpy.run_path(path, run_name="__main__")
+    except SystemExit as e:
+        return e.code in (None, 0)
+    except Exception as e:
+        print(f"✗ {name} raised: {str(e)}", file=sys.stderr)
+        return False
+    return True
+
+
+if __name__ == "__main__":
+    scripts = OFFLINE_SCRIPTS + (LIVE_SCRIPTS if "--live" in sys.argv[1:] else ())
+    failed = []
+    start = time.perf_counter()
+    for name in scripts:
+        print(f"\n=== {name} ===")
+        if not run_script(name):
+            failed.append(name)
+    elapsed = time.perf_counter() - start
+
+    print(f"\n{len(scripts) - len(failed)}/{len(scripts)} scripts passed in {elapsed:.2f}s")
+    if failed:
+        print(f"✗ Failed: {', '.join(failed)}", file=sys.stderr)
+        sys.exit(1)
@@ -41,13 +41,40 @@ try:
         print(f"  Score: {assessment['score']}")
         print(f"  Recommendation: {assessment['recommendation']}")
     else:
-        print(f"✗ Assessment failed: {result.get('error')}")
+        print(f"✗ Assessment failed: {result.get('error')}", file=sys.stderr)
         sys.exit(1)
     
+    # Test batch assessment on a synthetic cohort
+    print("\nTesting batch assessment...")
+    import random
+    rng = random.Random(42)
+    cohort = [
+        {
+            "vitals": {
+                "bp": f"{rng.randint(85, 200)}/{rng.randint(50, 130)}",
+                "hr": rng.randint(40, 150),
+                "spo2": rng.randint(82, 100),
+                "temp": round(rng.uniform(35.0, 40.5), 1)
+            },
+            "symptoms": rng.sample(["headache", "fatigue", "chest pain", "shortness of breath", "dizziness"], rng.randint(0, 3)),
+            "age": rng.randint(18, 95),
+            "gender": rng.choice(["M", "F"]),
+            "medical_history": rng.sample(["hypertension", "diabetes", "copd"], rng.randint(0, 2))
+        }
+        for _ in range(1000)
+    ]
+    
+    results = [ClinicalDecisionSupport.generate_assessment(patient) for patient in cohort]
+    failed = [r.get("error") for r in results if not r.get("success")]
+    if failed:
+        print(f"✗ Batch assessment failed: {failed[:3]}", file=sys.stderr)
+        sys.exit(1)
+    print(f"✓ Batch assessment successful ({len(results)} patients)")
+    
     print("\n✓ All tests passed! System ready for deployment.")
     
 except Exception as e:
-    print(f"✗ Test failed: {str(e)}")
+    print(f"✗ Test failed: {str(e)}", file=sys.stderr)
     import traceback
     traceback.print_exc()
     sys.exit(1)
@@ -1,28 +1,70 @@
 import requests
-import json
+from requests.adapters import HTTPAdapter
+import orjson
 import sys
+import asyncio
+import httpx
+import numpy as np
+
+# One pooled keep-alive session for every request this script makes
+SESSION = requests.Session()
+SESSION.mount("http://", HTTPAdapter(pool_connections=16, pool_maxsize=16, max_retries=0))
+# Bodies are encoded with orjson, so the content type is set by hand
+JSON_HEADERS = {"Content-Type": "application/json"}
+SESSION.headers.update(JSON_HEADERS)
+
+BASE_URL = "http://127.0.0.1:8005"
+
+SOAP_PAYLOAD = {
+  "patient_name": "Test User",
+  "age": 45,
+  "gender": "F",
+  "chief_complaint": "Persistent cough",
+  "vitals": {
+    "hr": 82,
+    "bp": "120/80",
+    "spo2": 98
+  },
+  "medical_history": ["Asthma"]
+}
 
 def test_soap():
-    url = "http://127.0.0.1:8005/generate-soap-note"
-    data = {
-      "patient_name": "Test User",
-      "age": 45,
-      "gender": "F",
-      "chief_complaint": "Persistent cough",
-      "vitals": {
-        "hr": 82,
-        "bp": "120/80",
-        "spo2": 98
-      },
-      "medical_history": ["Asthma"]
-    }
+    url = f"{BASE_URL}/generate-soap-note"
+    data = SOAP_PAYLOAD
     print(f"Sending request to {url}...")
     try:
-        r = requests.post(url, json=data, timeout=30)
+        r = SESSION.post(url, data=orjson.dumps(data), timeout=30)
         print(f"Status Code: {r.status_code}")
         print(f"Response: {r.text}")
     except Exception as e:
-        print(f"Error: {str(e)}")
+        print(f"Error: {str(e)}", file=sys.stderr)
+
+async def test_soap_many(payloads: list):
+    """Send all payloads concurrently and report status counts and latency percentiles"""
+    limits = httpx.Limits(max_connections=32)
+    async with httpx.AsyncClient(base_url=BASE_URL, http2=True, limits=limits, headers=JSON_HEADERS, timeout=60) as client:
+        print(f"Sending {len(payloads)} concurrent requests to {BASE_URL}/generate-soap-note...")
+        bodies = [orjson.dumps(p) for p in payloads]
+        responses = await asyncio.gather(
+            *(client.post("/generate-soap-note", content=b) for b in bodies),
+            return_exceptions=True
+        )
+    errors = [r for r in responses if isinstance(r, Exception)]
+    ok = [r for r in responses if not isinstance(r, Exception)]
+    statuses = {}
+    for r in ok:
+        statuses[r.status_code] = statuses.get(r.status_code, 0) + 1
+    print(f"Status codes: {statuses}, errors: {len(errors)}")
+    if ok:
+        latencies = [r.elapsed.total_seconds() for r in ok]
+        p50, p95 = np.percentile(latencies, [50, 95])
+        print(f"Latency p50: {p50:.3f}s  p95: {p95:.3f}s")
 
 if __name__ == "__main__":
-    test_soap()
+    # python test_endpoint.py [N]: N > 1 sends N concurrent requests
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1
+    if count > 1:
+        asyncio.run(test_soap_many([SOAP_PAYLOAD] * count))
+    else:
+        with SESSION:
+            test_soap()
@@ -1,53 +1,116 @@
 import requests
-import json
+from requests.adapters import HTTPAdapter
+import orjson
+import random
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 
-def test_risk_logic():
-    url = "http://127.0.0.1:8000/analyze-patient"
-    data = {
-        "age": 65,
-        "gender": "Male",
-        "chief_complaint": "Persistent cough and severe chest pain",
-        "vitals": {
-            "bp": "190/130",   # Critical BP
-            "hr": "100",
-            "temp": "38.5",    # Fever
-            "spo2": "88",      # Critical SpO2
-            "bmi": "42"        # Critical BMI
-        },
-        "symptoms": ["chest pain", "cough", "shortness of breath"],
-        "medical_history": ["hypertension", "diabetes"],
-        "lifestyle": {
-            "smoking": "Current",
-            "activity_level": "Sedentary",
-            "diet_quality": "Poor",
-            "sleep_hours": "5"
-        }
+# One pooled keep-alive session for every request this script makes
+# (pool sized for the stress test's 32 threads)
+SESSION = requests.Session()
+SESSION.mount("http://", HTTPAdapter(pool_connections=16, pool_maxsize=32, max_retries=0))
+# Bodies are encoded/decoded with orjson, so the content type is set by hand
+SESSION.headers["Content-Type"] = "application/json"
+
+URL = "http://127.0.0.1:8000/analyze-patient"
+
+BASE_PATIENT = {
+    "age": 65,
+    "gender": "Male",
+    "chief_complaint": "Persistent cough and severe chest pain",
+    "vitals": {
+        "bp": "190/130",   # Critical BP
+        "hr": "100",
+        "temp": "38.5",    # Fever
+        "spo2": "88",      # Critical SpO2
+        "bmi": "42"        # Critical BMI
+    },
+    "symptoms": ["chest pain", "cough", "shortness of breath"],
+    "medical_history": ["hypertension", "diabetes"],
+    "lifestyle": {
+        "smoking": "Current",
+        "activity_level": "Sedentary",
+        "diet_quality": "Poor",
+        "sleep_hours": "5"
     }
+}
+
+def test_risk_logic():
+    url = URL
+    data = BASE_PATIENT
     
     try:
-        response = requests.post(url, json=data, timeout=20)
+        response = SESSION.post(url, data=orjson.dumps(data), timeout=20)
         print(f"Status Code: {response.status_code}")
-        result = response.json()
+        result = orjson.loads(response.content)
         
+        # Report is assembled first and written in one go
         assessment = result.get("clinical_assessment", {})
-        print("\n--- Clinical Assessment ---")
-        print(f"Score: {assessment.get('score')}")
-        print(f"Level: {assessment.get('level')}")
-        
-        print("\n--- Findings ---")
+        lines = [
+            "\n--- Clinical Assessment ---",
+            f"Score: {assessment.get('score')}",
+            f"Level: {assessment.get('level')}",
+            "\n--- Findings ---"
+        ]
         findings = assessment.get("findings", {})
         for category, list_of_findings in findings.items():
-            print(f"{category.upper()}:")
-            for f in list_of_findings:
-                print(f"  - {f}")
+            lines.append(f"{category.upper()}:")
+            lines.extend(f"  - {f}" for f in list_of_findings)
         
-        print(f"\nImmediate Attention Needed: {assessment.get('requires_immediate_attention')}")
+        lines.append(f"\nImmediate Attention Needed: {assessment.get('requires_immediate_attention')}")
         
         workflow = result.get("workflow", {})
-        print(f"Workflow Risk Level: {workflow.get('risk_level')}")
+        lines.append(f"Workflow Risk Level: {workflow.get('risk_level')}")
+        sys.stdout.write("\n".join(lines) + "\n")
         
     except Exception as e:
-        print(f"Error: {e}")
+        print(f"Error: {e}", file=sys.stderr)
+
+def mutate(patient: dict, rng: random.Random) -> dict:
+    """Copy of a patient with randomized vitals, to reach different rule branches"""
+    return {
+        **patient,
+        "age": rng.randint(18, 95),
+        "vitals": {
+            "bp": f"{rng.randint(85, 210)}/{rng.randint(50, 135)}",
+            "hr": str(rng.randint(40, 150)),
+            "temp": str(round(rng.uniform(35.0, 40.5), 1)),
+            "spo2": str(rng.randint(82, 100)),
+            "bmi": str(round(rng.uniform(16, 45), 1))
+        }
+    }
+
+def stress_test(count: int = 256, workers: int = 32):
+    """Post `count` varied patients from `workers` threads; report throughput and level mix"""
+    rng = random.Random(42)
+    # Encoded up front so serialization stays out of the timed section
+    bodies = [orjson.dumps(mutate(BASE_PATIENT, rng)) for _ in range(count)]
+    
+    def post(body):
+        try:
+            return orjson.loads(SESSION.post(URL, data=body, timeout=20).content)
+        except Exception as e:
+            return {"error": str(e)}
+    
+    print(f"Sending {count} requests with {workers} threads...")
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        results = list(ex.map(post, bodies))
+    elapsed = time.perf_counter() - start
+    
+    levels = Counter(r.get("clinical_assessment", {}).get("level", "error") for r in results)
+    scores = Counter(10 * (r["clinical_assessment"]["score"] // 10) for r in results if "clinical_assessment" in r)
+    print(f"Completed in {elapsed:.2f}s ({count / elapsed:.1f} req/s)")
+    print(f"Risk levels: {dict(levels)}")
+    print(f"Score buckets: {dict(sorted(scores.items()))}")
 
 if __name__ == "__main__":
-    test_risk_logic()
+    # python verify_clinical_logic.py [N]: N > 1 runs the concurrent stress test
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1
+    with SESSION:
+        if count > 1:
+            stress_test(count)
+        else:
+            test_risk_logic()